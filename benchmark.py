@@ -0,0 +1,237 @@
+import os
+import logging
+import random
+import time
+
+import program.library.helpers as helpers
+
+from program.library.database import Database
+from program.library.schema import migrations
+from program.library.known_ids import KnownIds
+from program.library import stored_json
+
+# measures how the database access patterns behave as the tables grow
+# usage: python3 benchmark.py --sizes 1000,10000,100000 --operations 1000
+class Benchmark:
+    def run(self):
+        for size in self.sizes:
+            logging.info(f'Table size: {size}')
+
+            self.setUp(size)
+
+            results = [
+                self.measure('inDatabase', self.inDatabase),
+                self.measure('inDatabase page', self.inDatabasePage),
+                self.measure('isDone', self.isDone),
+                self.measure('toDatabase', self.toDatabase),
+                self.measure('markDone', self.markDone),
+                self.measure('keyword transaction', self.keywordTransaction, max(self.operations // 25, 1))
+            ]
+
+            for result in results:
+                self.showResult(size, result)
+
+            self.database.close()
+
+        self.removeDatabase()
+
+    def removeDatabase(self):
+        for suffix in ['', '-wal', '-shm']:
+            helpers.removeFile(self.fileName + suffix)
+
+    def setUp(self, size):
+        self.removeDatabase()
+
+        helpers.makeDirectory(os.path.dirname(self.fileName))
+
+        self.database = Database(self.fileName)
+        self.database.migrate(migrations)
+
+        self.ids = []
+        self.keywords = []
+        self.newIndex = 0
+
+        logging.info(f'Adding {size} rows to result and history')
+
+        batchSize = 10000
+
+        now = helpers.getTimestampSecondsAgo()
+
+        for start in range(0, size, batchSize):
+            results = []
+            history = []
+
+            for i in range(start, min(start + batchSize, size)):
+                id = f'profile-{i}'
+                keyword = f'keyword {i}'
+
+                self.ids.append(id)
+                self.keywords.append(keyword)
+
+                results.append(self.getResultRow(id, keyword, now - random.randrange(0, 180 * 24 * 60 * 60)))
+                history.append(self.getHistoryRow(keyword, now - random.randrange(0, 180 * 24 * 60 * 60)))
+
+            with self.database.transaction():
+                self.database.insert('result', results)
+                self.database.insert('history', history)
+
+        self.knownIds = KnownIds(self.database)
+
+    def measure(self, name, function, operations=None):
+        if not operations:
+            operations = self.operations
+
+        durations = []
+
+        started = time.perf_counter()
+
+        for i in range(0, operations):
+            operationStarted = time.perf_counter()
+
+            function()
+
+            durations.append(time.perf_counter() - operationStarted)
+
+        elapsed = time.perf_counter() - started
+
+        durations = sorted(durations)
+
+        return {
+            'name': name,
+            'operations': operations,
+            'p50': self.percentile(durations, 50),
+            'p95': self.percentile(durations, 95),
+            'p99': self.percentile(durations, 99),
+            'maximum': durations[-1],
+            'perSecond': operations / elapsed
+        }
+
+    def percentile(self, sortedValues, percent):
+        index = int(round(percent / 100 * (len(sortedValues) - 1)))
+
+        return sortedValues[index]
+
+    def showResult(self, size, result):
+        milliseconds = {}
+
+        for key in ['p50', 'p95', 'p99', 'maximum']:
+            milliseconds[key] = '{:.3f}'.format(result[key] * 1000)
+
+        logging.info(f'Size: {size}. {result["name"]}: p50 {milliseconds["p50"]} ms, p95 {milliseconds["p95"]} ms, p99 {milliseconds["p99"]} ms, maximum {milliseconds["maximum"]} ms. {result["perSecond"]:.0f} per second.')
+
+        helpers.appendToFile(f'{size},{result["name"]},{milliseconds["p50"]},{milliseconds["p95"]},{milliseconds["p99"]},{milliseconds["maximum"]},{result["perSecond"]:.0f}', self.outputFile)
+
+    # same access patterns as the scraper
+    def inDatabase(self):
+        id = self.getExistingOrNewId()
+
+        self.database.getFirst('result', 'id', 'site = ? and id = ?', ('linkedin.com', id))
+
+    def inDatabasePage(self):
+        ids = []
+
+        for i in range(0, 10):
+            ids.append(self.getExistingOrNewId())
+
+        self.knownIds.existing('linkedin.com', ids)
+
+    def isDone(self):
+        keyword = random.choice(self.keywords)
+
+        minimumTimestamp = helpers.getTimestampSecondsAgo(12 * 60 * 60)
+
+        self.database.getFirst('history', '*', 'keyword = ? and maximumNewResults = ? and gmTimestamp >= ?', (keyword, 25, minimumTimestamp))
+
+    def toDatabase(self):
+        self.newIndex += 1
+
+        self.database.insert('result', self.getResultRow(f'new-profile-{self.newIndex}', 'new keyword', helpers.getTimestampSecondsAgo()))
+
+    def markDone(self):
+        self.database.insert('history', self.getHistoryRow('new keyword', helpers.getTimestampSecondsAgo()))
+
+    def keywordTransaction(self):
+        with self.database.transaction():
+            for i in range(0, 25):
+                self.toDatabase()
+
+            self.markDone()
+
+    def getExistingOrNewId(self):
+        # about half of the search hits are already in the database
+        if random.randrange(0, 2) == 0:
+            return random.choice(self.ids)
+
+        return f'unknown-{random.randrange(0, 1000000000)}'
+
+    def getResultRow(self, id, keyword, timestamp):
+        item = {
+            'id': id,
+            'site': 'linkedin.com',
+            'linkedin url': f'https://www.linkedin.com/in/{id}/',
+            'first name': 'First',
+            'last name': 'Last',
+            'headline': 'Director of Operations at Example Company',
+            'summary': self.summary,
+            'positions': self.positions,
+            'companies': self.companies
+        }
+
+        return {
+            'site': 'linkedin.com',
+            'keyword': keyword,
+            'id': id,
+            'name': 'First Last',
+            'gmDate': '',
+            'gmTimestamp': timestamp,
+            'json': stored_json.encode(item)
+        }
+
+    def getHistoryRow(self, keyword, timestamp):
+        return {
+            'keyword': keyword,
+            'resultsFound': 25,
+            'maximumNewResults': 25,
+            'gmDate': '',
+            'gmTimestamp': timestamp
+        }
+
+    def __init__(self):
+        helpers.setUpLogging('user-data/logs', '-benchmark')
+
+        self.fileName = 'user-data/benchmark/benchmark.sqlite'
+        self.outputFile = 'user-data/benchmark/results.csv'
+
+        sizes = helpers.getParameter('--sizes', False, '1000,10000,100000,1000000')
+        self.sizes = [int(size) for size in sizes.split(',')]
+        self.operations = int(helpers.getParameter('--operations', False, '1000'))
+
+        self.summary = ' '.join(['Experienced professional with a background in operations and sales.'] * 10)
+
+        self.positions = []
+        self.companies = []
+
+        for i in range(0, 5):
+            self.positions.append({
+                'title': f'Position {i}',
+                'company': f'Company {i}',
+                'description': 'Responsible for day to day running of the team. ' * 5,
+                'startYear': 2010 + i,
+                'endYear': 2011 + i
+            })
+
+            self.companies.append({
+                'id': f'company-{i}',
+                'name': f'Company {i}',
+                'website': f'https://www.company{i}.com',
+                'headline': 'We make things',
+                'industry': 'Manufacturing'
+            })
+
+        helpers.makeDirectory(os.path.dirname(self.outputFile))
+
+        if not os.path.exists(self.outputFile):
+            helpers.toFile('size,operation,p50 ms,p95 ms,p99 ms,maximum ms,per second', self.outputFile)
+
+benchmark = Benchmark()
+benchmark.run()
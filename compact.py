@@ -0,0 +1,24 @@
+import program.library.helpers as helpers
+
+from program.library.database import openDatabase
+from program.library.schema import migrations
+from program.library.retention import Retention
+
+# converts the database to incremental vacuum once, so the maintenance between keywords can free unused pages.
+# rewrites the whole database file. run it while main.py isn't running.
+# usage: python3 compact.py
+helpers.setUpLogging('user-data/logs', '-compact')
+
+options = {
+    'databaseType': 'sqlite'
+}
+
+helpers.setOptions('user-data/options.ini', options)
+
+database = openDatabase(options)
+database.migrate(migrations)
+
+retention = Retention(options, database)
+retention.convertToIncrementalVacuum()
+
+database.close()
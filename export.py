@@ -0,0 +1,27 @@
+import sys
+
+import program.library.helpers as helpers
+
+from program.library.database import openDatabase
+from program.library.schema import migrations
+from program.library.export import Export
+
+# writes output.csv and companies.csv from the result table in one pass
+# usage: python3 export.py [--full] [--outputDirectory user-data/output]
+helpers.setUpLogging('user-data/logs', '-export')
+
+options = {
+    'databaseType': 'sqlite'
+}
+
+helpers.setOptions('user-data/options.ini', options)
+
+database = openDatabase(options)
+database.migrate(migrations)
+
+outputDirectory = helpers.getParameter('--outputDirectory', False, 'user-data/output')
+
+export = Export(database, outputDirectory, '--full' in sys.argv)
+export.run()
+
+database.close()
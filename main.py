@@ -1,31 +1,146 @@
 import os
 import sys
 import logging
+import threading
+import multiprocessing
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
 import program.library.helpers as helpers
 
 from program.library.helpers import get
-from program.library.database import Database
+from program.library.database import openDatabase
+from program.library.schema import migrations
 from program.library.information_finder import InformationFinder
+from program.library.retention import Retention
+from program.library.export import Export
+from program.library import worker_process
 
 class Main:
     def run(self):
-        for fileIndex, inputFile in enumerate(self.inputFiles):
-            self.inputFile = inputFile
+        # so pending writes are committed and the files closed even after ctrl+c
+        try:
+            if self.options['workers'] > 1:
+                self.runWorkers()
+            else:
+                for fileIndex, inputFile in enumerate(self.inputFiles):
+                    self.inputFile = inputFile
+
+                    self.inputRows = helpers.getCsvFile(self.inputFile)
+
+                    for i, inputRow in enumerate(self.inputRows):
+                        try:
+                            self.showStatus(fileIndex, i, inputRow)
+                            self.doItem(inputRow)
+                        except Exception as e:
+                            helpers.handleException(e)
+        finally:
+            self.cleanUp()
+
+    def doItem(self, inputRow):
+        self.informationFinder.run(inputRow, self.outputDirectory, self.inputFile)
+
+        self.retention.runIfDue()
+
+    # a slow keyword only holds up its own worker
+    def runWorkers(self):
+        workers = self.options['workers']
+        workerType = self.options['workerType']
+
+        logging.info(f'Starting {workers} {workerType} workers')
+
+        manager = None
+
+        if workerType == 'process':
+            # spawn so the workers don't inherit this process's database connections
+            context = multiprocessing.get_context('spawn')
+
+            # so the rate limits apply to all the processes together
+            manager = context.Manager()
+            initargs = (self.options, manager.dict(), manager.Lock())
+
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=worker_process.startWorker, initargs=initargs)
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+
+        futures = {}
+        progress = {}
+
+        try:
+            with executor:
+                for fileIndex, inputFile in enumerate(self.inputFiles):
+                    inputRows = helpers.getCsvFile(inputFile)
+
+                    progress[inputFile] = {
+                        'done': 0,
+                        'total': len(inputRows)
+                    }
+
+                    for inputRow in inputRows:
+                        if workerType == 'process':
+                            future = executor.submit(worker_process.doItem, inputRow, self.outputDirectory, inputFile)
+                        else:
+                            future = executor.submit(self.doItemInThread, inputRow, inputFile)
+
+                        futures[future] = (fileIndex, inputFile, inputRow)
 
-            self.inputRows = helpers.getCsvFile(self.inputFile)
-            
-            for i, inputRow in enumerate(self.inputRows):
                 try:
-                    self.showStatus(fileIndex, i, inputRow)
-                    self.doItem(inputRow)
-                except Exception as e:
-                    helpers.handleException(e)
-    
-        self.cleanUp()
+                    for future in as_completed(futures):
+                        fileIndex, inputFile, inputRow = futures[future]
 
-    def doItem(self, inputRow):
-        self.informationFinder.run(inputRow, self.outputDirectory)
+                        try:
+                            future.result()
+                        except Exception as e:
+                            helpers.handleException(e)
+
+                        progress[inputFile]['done'] += 1
+
+                        self.showProgress(fileIndex, inputFile, inputRow, progress[inputFile])
+
+                        # only the main thread does maintenance
+                        self.retention.runIfDue()
+                except KeyboardInterrupt:
+                    logging.info('Stopping')
+
+                    # workers that are waiting stop waiting and finish their current item
+                    helpers.stopEvent.set()
+
+                    for future in futures:
+                        future.cancel()
+
+                    raise
+        finally:
+            # after the workers are gone
+            if manager:
+                manager.shutdown()
+
+        # the workers only wrote to the database
+        if workerType == 'process' and self.options['writeCsvFiles']:
+            logging.info('Writing the csv files')
+
+            export = Export(self.database, self.outputDirectory)
+            export.run()
+
+    def doItemInThread(self, inputRow, inputFile):
+        logging.info(f'Input file: {helpers.fileNameOnly(inputFile)}. Keyword: {get(inputRow, "keyword")}. Search type: {inputRow.get("type", "url")}.')
+
+        self.getInformationFinder().run(inputRow, self.outputDirectory, inputFile)
+
+    # each worker thread has its own one. they share the output files, known id's and caches.
+    def getInformationFinder(self):
+        informationFinder = getattr(self.workerObjects, 'informationFinder', None)
+
+        if informationFinder:
+            return informationFinder
+
+        informationFinder = InformationFinder(self.options, self.database, self.informationFinder)
+
+        self.workerObjects.informationFinder = informationFinder
+
+        with self.lock:
+            self.informationFinders.append(informationFinder)
+
+        return informationFinder
 
     def showStatus(self, fileIndex, i, inputRow):
         keyword = get(inputRow, 'keyword')
@@ -33,7 +148,18 @@ class Main:
 
         logging.info(f'File {fileIndex + 1} of {len(self.inputFiles)}: {helpers.fileNameOnly(self.inputFile)}. Item {i + 1} of {len(self.inputRows)}: {keyword}. Search type: {searchType}.')
 
+    def showProgress(self, fileIndex, inputFile, inputRow, progress):
+        logging.info(f'File {fileIndex + 1} of {len(self.inputFiles)}: {helpers.fileNameOnly(inputFile)}. Finished {progress["done"]} of {progress["total"]} items. Last one: {get(inputRow, "keyword")}.')
+
     def cleanUp(self):
+        for informationFinder in self.informationFinders:
+            informationFinder.close()
+
+        if self.informationFinder:
+            self.informationFinder.close()
+
+        self.database.close()
+
         logging.info('Done')
 
     def __init__(self):
@@ -55,6 +181,22 @@ class Main:
             'hoursBetweenRuns': 12,
             'restartSearch': 0,
             'maximumDaysToKeepItems': 180,
+            'hoursBetweenMaintenance': 24,
+            'hoursToKeepCompanyInformation': 720,
+            'hoursToKeepCheckpoints': 24,
+            'workers': 1,
+            'workerType': 'thread',
+            'companyThreads': 4,
+            'pipelineQueueSize': 10,
+            'maximumRequestsPerHost': 2,
+            'rateLimits': 'linkedInSearchPage=5-10, api.salesql.com=1, googleMapsPage=1',
+            'commitEvery': 1,
+            'millisecondsBetweenCommits': 0,
+            'compressJson': 1,
+            'writeCsvFiles': 1,
+            'splitOutputBy': '',
+            'maximumRowsPerFile': 0,
+            'databaseType': 'sqlite',
             'defaultSearchUrl': 'https://www.google.com',
             'ignorePatterns': '',
             'ignoreDomains': '',
@@ -68,19 +210,26 @@ class Main:
             self.options['maximumSearchResults'] = 25
             self.options['maximumNewResults'] = 3
             self.options['secondsBetweenKeywords'] = 1
+            self.options['rateLimits'] = 'linkedInSearchPage=1, googleMapsPage=1'
+
+        self.database = openDatabase(self.options)
+        self.database.commitEvery = self.options['commitEvery']
+        self.database.millisecondsBetweenCommits = self.options['millisecondsBetweenCommits']
 
-        self.database = Database('user-data/database.sqlite')
+        self.database.migrate(migrations)
 
-        self.database.execute('create table if not exists result ( site text, keyword text, id text, name text, gmDate text, json text, primary key(site, id) )')
-        self.database.execute('create table if not exists history ( id integer primary key, keyword text, resultsFound integer, maximumNewResults integer, gmDate text )')
+        self.informationFinder = None
+        self.informationFinders = []
+        self.workerObjects = threading.local()
+        self.lock = threading.Lock()
 
-        domainsToSearch = [
-            'linkedin.com',
-            'maps.google.com',
-            'google.com'
-        ]
+        # worker processes make their own
+        if self.options['workers'] <= 1 or self.options['workerType'] != 'process':
+            self.informationFinder = InformationFinder(self.options, self.database)
 
-        self.informationFinder = InformationFinder(self.options, self.database, domainsToSearch)
+        self.retention = Retention(self.options, self.database)
 
-main = Main()
-main.run()
+# worker processes import this file too
+if __name__ == '__main__':
+    main = Main()
+    main.run()
@@ -4,17 +4,20 @@ import os.path
 import random
 import json
 import urllib.parse
+import threading
 
 from collections import OrderedDict
 
 from . import helpers
 
 from .helpers import get
+from .host_scheduler import hostScheduler
+
+# one requests session per thread, shared by all Api objects
+sessions = threading.local()
 
 class Api:
     def get(self, url, parameters=None, responseIsJson=True):
-        import requests
-
         result = ''
 
         if responseIsJson:
@@ -44,7 +47,19 @@ class Api:
                     else:
                         return result
 
-            response = requests.get(self.urlPrefix + url, params=parameters, headers=self.headers, proxies=self.proxies, timeout=self.timeout, verify=verify)
+            # only waits if the host has a rate limit
+            if not hostScheduler.acquire(self.getHost(url)):
+                logging.debug(f'Stopping. Not sending the request to {url}.')
+                return result
+
+            session = self.getSession()
+
+            with hostScheduler.limit(self.getHost(url)):
+                try:
+                    response = session.get(self.urlPrefix + url, params=parameters, headers=self.headers, proxies=self.proxies, timeout=self.timeout, verify=verify)
+                finally:
+                    # requests.get doesn't keep cookies between calls either. only the cookies in self.headers get sent.
+                    session.cookies.clear()
 
             self.handleResponseLog(url, parameters, response, fileName)
             
@@ -62,8 +77,6 @@ class Api:
         return self.get(url, None, False)
 
     def post(self, url, data, responseIsJson=True):
-        import requests
-        
         result = {}
 
         if not responseIsJson:
@@ -86,7 +99,18 @@ class Api:
                 # don't want to read files for post, just write them
                 fileName = self.getCacheFileName(url, {}, responseIsJson)
 
-            response = requests.post(self.urlPrefix + url, headers=self.headers, proxies=self.proxies, data=data, timeout=self.timeout, verify=verify)
+            # only waits if the host has a rate limit
+            if not hostScheduler.acquire(self.getHost(url)):
+                logging.debug(f'Stopping. Not sending the request to {url}.')
+                return result
+
+            session = self.getSession()
+
+            with hostScheduler.limit(self.getHost(url)):
+                try:
+                    response = session.post(self.urlPrefix + url, headers=self.headers, proxies=self.proxies, data=data, timeout=self.timeout, verify=verify)
+                finally:
+                    session.cookies.clear()
 
             self.handleResponseLog(url, {}, response, fileName)
 
@@ -99,6 +123,31 @@ class Api:
 
         return result
 
+    # reuses connections instead of a new tcp and tls handshake for every request
+    def getSession(self):
+        session = getattr(sessions, 'session', None)
+
+        if session:
+            return session
+
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+
+        # sessions aren't safe to share between threads, so each thread gets its own. it's used for all hosts.
+        adapter = HTTPAdapter(pool_connections=20, pool_maxsize=20)
+
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        sessions.session = session
+
+        return session
+
+    def getHost(self, url):
+        return urllib.parse.urlparse(self.urlPrefix + url).netloc
+
     def downloadBinaryFile(self, url, destinationFileName):       
         result = False
         
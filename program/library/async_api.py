@@ -0,0 +1,214 @@
+import sys
+import logging
+import os.path
+import json
+import time
+import asyncio
+
+from . import helpers
+
+from .api import Api
+from .host_scheduler import hostScheduler
+
+# the parts of a requests response that Api.handleResponseLog uses
+class AsyncResponse:
+    def __bool__(self):
+        return self.status < 400
+
+    def __init__(self, status, headers, content, text):
+        self.status = status
+        self.headers = headers
+        self.content = content
+        self.text = text
+
+# same as Api, but many requests can be in progress at once on one thread
+class AsyncApi(Api):
+    async def get(self, url, parameters=None, responseIsJson=True):
+        result = ''
+
+        if responseIsJson:
+            result = {}
+
+        try:
+            logging.debug(f'Get {url}')
+
+            verify = True
+
+            fileName = ''
+
+            if '--debug' in sys.argv:
+                logging.debug(f'Request headers: {self.headers}')
+
+                if self.proxies and 'localhost:' in self.proxies.get('http', ''):
+                    verify = False
+
+                fileName = self.getCacheFileName(url, parameters, responseIsJson)
+
+                if not '--noCache' in sys.argv and os.path.exists(fileName):
+                    logging.info('Using cached version')
+                    result = helpers.getFile(fileName)
+
+                    if responseIsJson:
+                        return json.loads(result)
+                    else:
+                        return result
+
+            response = await self.request('GET', url, parameters, None, verify)
+
+            # stopping
+            if response is None:
+                return result
+
+            self.handleResponseLog(url, parameters, response, fileName)
+
+            if responseIsJson:
+                result = json.loads(response.text)
+            else:
+                result = response.text
+
+        except Exception as e:
+            helpers.handleException(e)
+
+        return result
+
+    async def getPlain(self, url):
+        return await self.get(url, None, False)
+
+    async def post(self, url, data, responseIsJson=True):
+        result = {}
+
+        if not responseIsJson:
+            result = ''
+
+        try:
+            logging.debug(f'Post {url}')
+
+            verify = True
+
+            fileName = ''
+
+            if '--debug' in sys.argv:
+                logging.debug(f'Request headers: {self.headers}')
+                logging.debug(f'Request body: {data}')
+
+                if self.proxies and 'localhost:' in self.proxies.get('http', ''):
+                    verify = False
+
+                # don't want to read files for post, just write them
+                fileName = self.getCacheFileName(url, {}, responseIsJson)
+
+            response = await self.request('POST', url, None, data, verify)
+
+            if response is None:
+                return result
+
+            self.handleResponseLog(url, {}, response, fileName)
+
+            if responseIsJson:
+                result = json.loads(response.text)
+            else:
+                result = response.text
+        except Exception as e:
+            helpers.handleException(e)
+
+        return result
+
+    # gets all the urls at the same time. results are in the same order as the urls.
+    async def getAll(self, urls, responseIsJson=True):
+        return await asyncio.gather(*[self.get(url, None, responseIsJson) for url in urls])
+
+    async def request(self, method, url, parameters, data, verify):
+        session = self.getAsyncSession()
+
+        fullUrl = self.urlPrefix + url
+
+        # same rate limits as Api, without blocking the event loop
+        if helpers.stopEvent.is_set():
+            return None
+
+        seconds = hostScheduler.reserve(self.getHost(url))
+
+        if seconds > 0 and not await self.waitForPermit(seconds):
+            return None
+
+        # the same per host limit as Api, so threads with their own event loops don't add up to more
+        semaphore = hostScheduler.getSemaphore(self.getHost(url))
+
+        if not await self.acquireSemaphore(semaphore):
+            return None
+
+        try:
+            return await self.send(session, method, fullUrl, parameters, data, verify)
+        finally:
+            semaphore.release()
+
+    async def send(self, session, method, fullUrl, parameters, data, verify):
+        import aiohttp
+
+        proxy = None
+
+        if self.proxies:
+            scheme = fullUrl.split(':')[0]
+            proxy = self.proxies.get(scheme, self.proxies.get('http', None))
+
+        ssl = None
+
+        if not verify:
+            ssl = False
+
+        async with session.request(method, fullUrl, params=parameters, data=data, headers=self.headers, proxy=proxy, ssl=ssl, timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+            content = await response.read()
+
+            text = content.decode(response.get_encoding(), errors='replace')
+
+            return AsyncResponse(response.status, response.headers, content, text)
+
+    # doesn't block the event loop while other requests hold the permits. returns False when stopping.
+    async def acquireSemaphore(self, semaphore):
+        while not semaphore.acquire(blocking=False):
+            if helpers.stopEvent.is_set():
+                return False
+
+            await asyncio.sleep(0.05)
+
+        return True
+
+    # returns False when stopping
+    async def waitForPermit(self, seconds):
+        ends = time.monotonic() + seconds
+
+        while time.monotonic() < ends:
+            if helpers.stopEvent.is_set():
+                return False
+
+            # short steps so the threading event can still cancel it
+            await asyncio.sleep(min(ends - time.monotonic(), 0.5))
+
+        return not helpers.stopEvent.is_set()
+
+    # sessions belong to the event loop they were made in
+    def getAsyncSession(self):
+        import aiohttp
+
+        if self.session and not self.session.closed:
+            return self.session
+
+        # the per host limit comes from hostScheduler in request()
+        connector = aiohttp.TCPConnector(limit=self.maximumConnections)
+
+        # like requests.get, only the cookies in self.headers get sent
+        self.session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar())
+
+        return self.session
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+
+        self.session = None
+
+    def __init__(self, urlPrefix):
+        super().__init__(urlPrefix)
+
+        self.session = None
+        self.maximumConnections = 100
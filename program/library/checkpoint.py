@@ -0,0 +1,76 @@
+import json
+import logging
+import threading
+
+from . import helpers
+
+from .helpers import get
+
+# how far a keyword's search got. lets an interrupted keyword continue where it stopped instead of starting from the first page.
+class Checkpoint:
+    def load(self):
+        if self.options.get('restartSearch', 0):
+            return
+
+        minimumTimestamp = helpers.getTimestampSecondsAgo(self.options.get('hoursToKeepCheckpoints', 24) * 60 * 60)
+
+        row = self.database.getFirst('checkpoint', '*', 'keyword = ? and searchType = ? and gmTimestamp >= ?', (self.keyword, self.searchType, minimumTimestamp))
+
+        if not row:
+            return
+
+        self.start = row['start'] or 0
+        self.searchResultIndex = row['searchResultIndex'] or 0
+        self.searchResults = json.loads(row['searchResults'] or '[]')
+        self.enriched = json.loads(row['enriched'] or '[]')
+
+        logging.info(f'Resuming {self.keyword} from search result {self.searchResultIndex}. Already have {len(self.enriched)} results.')
+
+    # called after each page of search results
+    def addPage(self, start, searchResultIndex, searchResults):
+        with self.lock:
+            self.start = start
+            self.searchResultIndex = searchResultIndex
+            self.searchResults += searchResults
+
+            self.save()
+
+    # called after each result is written
+    def addEnriched(self, id):
+        with self.lock:
+            self.enriched.append(id)
+
+            self.save()
+
+    def save(self):
+        item = {
+            'keyword': self.keyword,
+            'searchType': self.searchType,
+            'start': self.start,
+            'searchResultIndex': self.searchResultIndex,
+            'searchResults': json.dumps(self.searchResults),
+            'enriched': json.dumps(self.enriched),
+            'gmTimestamp': helpers.getTimestampSecondsAgo()
+        }
+
+        self.database.insert('checkpoint', item)
+
+    def delete(self):
+        self.database.execute('delete from checkpoint where keyword = ? and searchType = ?', (self.keyword, self.searchType))
+
+    def __init__(self, options, database, inputRow):
+        self.options = options
+        self.database = database
+        self.keyword = get(inputRow, 'keyword')
+        self.searchType = get(inputRow, 'search type')
+        # the search is written from one thread and the results from another
+        self.lock = threading.Lock()
+        # offset of the next page to get
+        self.start = 0
+        self.searchResultIndex = 0
+        # search hits found so far. the ones that are already in the database get skipped when resuming.
+        self.searchResults = []
+        # id's of the results that are already written
+        self.enriched = []
+
+        self.load()
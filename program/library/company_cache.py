@@ -0,0 +1,71 @@
+import threading
+
+from . import helpers
+from . import stored_json
+
+from .helpers import get
+
+# company information from Google Maps and the company's website. saved in the database so each company is only looked up once.
+class CompanyCache:
+    def get(self, id):
+        if not id:
+            return {}
+
+        with self.lock:
+            if id in self.companies:
+                return self.companies[id]
+
+        minimumTimestamp = helpers.getTimestampSecondsAgo(self.options.get('hoursToKeepCompanyInformation', 720) * 60 * 60)
+
+        row = self.database.getFirst('company', 'json', 'id = ? and gmTimestamp >= ?', (id, minimumTimestamp))
+
+        if not row:
+            return {}
+
+        result = stored_json.decode(row['json'])
+
+        with self.lock:
+            self.companies[id] = result
+
+        return result
+
+    def put(self, company):
+        id = get(company, 'id')
+
+        if not id:
+            return
+
+        with self.lock:
+            self.companies[id] = dict(company)
+
+        item = {
+            'id': id,
+            'name': get(company, 'name'),
+            'gmTimestamp': helpers.getTimestampSecondsAgo(),
+            'json': stored_json.encode(company, self.options.get('compressJson', 1))
+        }
+
+        self.database.insert('company', item)
+
+    # only fills in what the company doesn't already have
+    def apply(self, company, cachedCompany):
+        mediaLinks = get(company, 'media links')
+
+        company = helpers.mergeDictionaries(company, cachedCompany)
+
+        # media links are added to, not replaced
+        for link in get(cachedCompany, 'media links').splitlines():
+            if link and not link in mediaLinks:
+                mediaLinks += '\n' + link
+
+        if mediaLinks:
+            company['media links'] = mediaLinks
+
+        return company
+
+    def __init__(self, options, database):
+        self.options = options
+        self.database = database
+        # for this run
+        self.companies = {}
+        self.lock = threading.Lock()
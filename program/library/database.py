@@ -4,16 +4,32 @@ import sqlite3
 import logging
 import time
 import random
+import threading
+
+from contextlib import contextmanager
 
 from . import helpers
 
 from ..library.helpers import get
 
+# each thread gets its own connection because sqlite3 connections can't be shared between threads
+class ConnectionState:
+    def __init__(self):
+        self.connection = None
+        self.cursor = None
+        self.transactionDepth = 0
+        # migrations need to stop on errors instead of skipping the statement
+        self.raiseErrors = False
+        self.pendingWrites = 0
+        self.lastCommit = time.time()
+        # the flush thread commits for this connection too
+        self.lock = threading.RLock()
+
 class Database:
-    def execute(self, statement):
-        self.executeWithRetries(statement)
+    def execute(self, statement, parameters=None):
+        self.executeWithRetries(statement, parameters)
 
-    def get(self, table, columns, where, orderBy, orderType, limit=None):
+    def get(self, table, columns, where, parameters=None, orderBy=None, orderType=None, limit=None):
         result = []
 
         wherePart = ''
@@ -27,11 +43,12 @@ class Database:
             orderByPart = f' order by {orderBy} {orderType}'
 
         if limit:
-            limitPart = f' limit {limit}'
+            limitPart = f' limit {int(limit)}'
 
+        # values go in parameters so the statement text stays the same and sqlite can reuse it
         query = f'select {columns} from {table}{wherePart}{orderByPart}{limitPart};'
 
-        self.executeWithRetries(query)
+        self.executeWithRetries(query, parameters)
 
         try:
             rows = self.cursor.fetchall()
@@ -43,36 +60,265 @@ class Database:
 
         return result
 
-    def getFirst(self, table, columns, where, orderBy=None, orderType=None):
+    # yields rows a batch at a time instead of loading the whole result into memory
+    def iterate(self, table, columns, where, parameters=None, batchSize=1000, asTuples=False, orderBy=None, orderType=None):
+        wherePart = ''
+        orderByPart = ''
+
+        if where:
+            wherePart = f' where {where}'
+
+        if orderBy:
+            orderByPart = f' order by {orderBy} {orderType}'
+
+        query = f'select {columns} from {table}{wherePart}{orderByPart};'
+
+        # separate cursor so other queries can run while this one is being read
+        state = self.getState()
+        cursor = state.connection.cursor()
+
+        if self.type == 'mysql':
+            # a mysql connection can't run other queries until an unbuffered result is read, so stream on a connection of its own
+            state = ConnectionState()
+            self.openConnection(state, False)
+            cursor = state.cursor
+
+        try:
+            self.executeWithRetries(query, parameters, cursor=cursor)
+
+            while True:
+                rows = cursor.fetchmany(batchSize)
+
+                if not rows:
+                    break
+
+                for row in rows:
+                    if asTuples:
+                        if isinstance(row, dict):
+                            yield tuple(row.values())
+                        else:
+                            yield tuple(row)
+                    else:
+                        yield dict(row)
+        finally:
+            cursor.close()
+
+            if self.type == 'mysql':
+                state.connection.close()
+
+    def getFirst(self, table, columns, where, parameters=None, orderBy=None, orderType=None):
         result = {}
 
-        rows = self.get(table, columns, where, orderBy, orderType, 1)
+        rows = self.get(table, columns, where, parameters, orderBy, orderType, 1)
 
         if len(rows) > 0:
             result = rows[0]
 
         return result
 
-    def executeWithRetries(self, query):
-        maximumTries = 1000
+    def existing(self, site, ids):
+        result = set()
+
+        ids = list(ids)
+
+        # stay under the limit on the number of parameters in one statement
+        chunkSize = 500
+
+        for i in range(0, len(ids), chunkSize):
+            chunk = ids[i:i + chunkSize]
+
+            placeholders = ', '.join(['?'] * len(chunk))
+
+            rows = self.get('result', 'id', f'site = ? and id in ({placeholders})', [site] + chunk)
+
+            for row in rows:
+                result.add(row['id'])
+
+        return result
+
+    def executeWithRetries(self, query, parameters=None, many=False, cursor=None):
+        # sqlite already waits up to busyTimeout for locks itself. these retries are for what's left.
+        maximumTries = 5
+
+        if parameters is None:
+            parameters = ()
+
+        state = self.getState()
+
+        if not cursor:
+            cursor = state.cursor
+
+        if self.type == 'mysql':
+            query = query.replace('?', '%s')
 
         for i in range(0, maximumTries):
+            started = time.time()
+
             try:
-                self.cursor.execute(query)
+                with state.lock:
+                    if many:
+                        cursor.executemany(query, parameters)
+                    else:
+                        cursor.execute(query, parameters)
 
                 # if it's here it means it succeeded
                 break
-            except sqlite3.OperationalError as e:
-                if str(e) == 'database is locked':
-                    logging.error(f'Database locked. Retrying. {i + 1} of {maximumTries}.')
+            except Exception as e:
+                # a transaction that was in progress is gone with the old connection, so can't just retry
+                if self.isDisconnectError(e) and state.transactionDepth == 0 and i < maximumTries - 1 and cursor == state.cursor:
+                    logging.warning(f'Lost connection to the database. Reconnecting. {i + 1} of {maximumTries}.')
+
+                    self.reconnect(state)
+                    cursor = state.cursor
+                    continue
+
+                if not self.isLockError(e) or i == maximumTries - 1:
+                    if state.raiseErrors:
+                        raise
 
-                    seconds = random.randrange(100, 1000) / 1000
-                    time.sleep(seconds)
-                else:
                     self.handleException(e)
                     break
 
-        self.connection.commit()
+                seconds = min(2 ** i, 30) * random.uniform(0.5, 1)
+
+                self.lockErrors += 1
+                self.secondsWaitingForLocks += time.time() - started + seconds
+
+                logging.warning(f'Database locked. Retrying in {seconds:.1f} seconds. {i + 1} of {maximumTries}. Total time waiting for locks: {self.secondsWaitingForLocks:.1f} seconds.')
+
+                time.sleep(seconds)
+
+        # reads never need a commit
+        if self.isWrite(query):
+            self.onWrite()
+
+    def isLockError(self, e):
+        if self.type == 'mysql':
+            # lock wait timeout and deadlock
+            return getattr(e, 'errno', None) in [1205, 1213]
+
+        return str(e).startswith('database is locked') or str(e).startswith('database table is locked')
+
+    def isDisconnectError(self, e):
+        if self.type != 'mysql':
+            return False
+
+        # server has gone away, lost connection during query, not connected
+        return getattr(e, 'errno', None) in [2006, 2013, 2055] or type(e).__name__ == 'InterfaceError'
+
+    def reconnect(self, state):
+        try:
+            state.connection.close()
+        except Exception as e:
+            logging.debug(e)
+
+        state.connection = None
+        state.cursor = None
+        state.pendingWrites = 0
+
+        self.openConnection(state)
+
+    def isWrite(self, query):
+        return not query.lstrip().lower().startswith(('select', 'pragma', 'explain'))
+
+    def onWrite(self):
+        state = self.getState()
+
+        state.pendingWrites += 1
+
+        # the transaction commits once when it ends
+        if state.transactionDepth > 0:
+            return
+
+        if state.pendingWrites >= self.commitEvery:
+            self.commit()
+        elif (time.time() - state.lastCommit) * 1000 >= self.getMillisecondsBetweenCommits():
+            self.commit()
+        else:
+            # a connection that stops writing would otherwise keep the write lock
+            self.startFlushThread()
+
+    def getMillisecondsBetweenCommits(self):
+        if self.millisecondsBetweenCommits > 0:
+            return self.millisecondsBetweenCommits
+
+        return self.defaultMillisecondsBetweenCommits
+
+    def startFlushThread(self):
+        with self.statesLock:
+            if self.flushThread:
+                return
+
+            self.flushThread = threading.Thread(target=self.flushPeriodically, daemon=True)
+            self.flushThread.start()
+
+    # commits writes that have waited too long, for every thread's connection
+    def flushPeriodically(self):
+        while not self.stopFlushing.wait(self.getMillisecondsBetweenCommits() / 1000 / 4):
+            with self.statesLock:
+                states = list(self.states)
+
+            for state in states:
+                if not state.pendingWrites or state.transactionDepth > 0:
+                    continue
+
+                if (time.time() - state.lastCommit) * 1000 < self.getMillisecondsBetweenCommits():
+                    continue
+
+                # skip connections that are busy. they'll be checked again soon.
+                if not state.lock.acquire(blocking=False):
+                    continue
+
+                try:
+                    if state.pendingWrites and state.transactionDepth == 0:
+                        self.commit(state)
+                finally:
+                    state.lock.release()
+
+    def commit(self, state=None):
+        if not state:
+            state = self.getState()
+
+        with state.lock:
+            if not state.connection:
+                return
+
+            try:
+                state.connection.commit()
+            except Exception as e:
+                self.handleException(e)
+
+            state.pendingWrites = 0
+            state.lastCommit = time.time()
+
+    @contextmanager
+    def transaction(self):
+        state = self.getState()
+
+        # a failed statement has to reach the rollback below instead of being logged and skipped
+        raiseErrors = state.raiseErrors
+
+        state.raiseErrors = True
+        state.transactionDepth += 1
+
+        try:
+            yield self
+        except:
+            state.transactionDepth -= 1
+
+            if state.transactionDepth == 0:
+                with state.lock:
+                    state.connection.rollback()
+                    state.pendingWrites = 0
+
+            raise
+        finally:
+            state.raiseErrors = raiseErrors
+
+        state.transactionDepth -= 1
+
+        if state.transactionDepth == 0:
+            self.commit(state)
 
     def insert(self, table, toInsert):
         if not toInsert:
@@ -94,78 +340,236 @@ class Database:
         for key in items[0]:
             columns.append(key)
 
-        columns = ', '.join(columns)
-
         groupsOfValues = []
 
-        for item in items:            
+        for item in items:
             values = []
-            
-            for key, value in item.items():
-                # escape single quotes
-                if isinstance(value, str):
-                    value = "'" + value.replace("'", "''") + "'"
-                elif value == None:
-                    value = 'null'
-
-                values.append(str(value))
 
-            values = ', '.join(values)
-            values = f'({values})'
+            for column in columns:
+                values.append(item.get(column, None))
 
-            groupsOfValues.append(values)
+            groupsOfValues.append(tuple(values))
 
-        groupsOfValues = ', '.join(groupsOfValues)
+        placeholders = ', '.join(['?'] * len(columns))
+        columns = ', '.join(columns)
 
         query = ''
 
         if self.type == 'sqlite':
-            query = f'insert or replace into {table} ({columns}) values {groupsOfValues};'
+            query = f'insert or replace into {table} ({columns}) values ({placeholders});'
         elif self.type == 'mysql':
-            query = f'replace into {table} ({columns}) values {groupsOfValues};'
+            query = f'replace into {table} ({columns}) values ({placeholders});'
 
-        self.executeWithRetries(query)
+        if len(groupsOfValues) == 1:
+            self.executeWithRetries(query, groupsOfValues[0])
+        else:
+            self.executeWithRetries(query, groupsOfValues, True)
 
     def open(self, name):
         if not name:
             return
 
+        self.name = name
+
+        # connects for the current thread
+        self.getState()
+
+    def getState(self):
+        state = getattr(self.local, 'state', None)
+
+        if state:
+            return state
+
+        state = ConnectionState()
+
+        self.local.state = state
+
+        self.openConnection(state)
+
+        with self.statesLock:
+            self.states.append(state)
+
+        return state
+
+    def openConnection(self, state, buffered=True):
+        if not self.name:
+            return
+
         try:
             if self.type == 'sqlite':
-                self.connection = sqlite3.connect(name)
+                # each connection is only used by the thread that opened it. this just lets close() run from any thread.
+                state.connection = sqlite3.connect(self.name, timeout=self.busyTimeout / 1000, check_same_thread=False)
                 # to get column names
-                self.connection.row_factory = sqlite3.Row
-                self.cursor = self.connection.cursor()
+                state.connection.row_factory = sqlite3.Row
+                state.cursor = state.connection.cursor()
+
+                self.setPragmas(state.cursor)
             elif self.type == 'mysql':
                 import mysql.connector                
                 
-                self.connection = mysql.connector.connect(host=get(name, 'host'), user=get(name, 'user'), passwd=get(name, 'password'))
+                name = self.name
+
+                port = get(name, 'port')
+
+                if not port:
+                    port = 3306
+
+                state.connection = mysql.connector.connect(host=get(name, 'host'), port=int(port), user=get(name, 'user'), passwd=get(name, 'password'))
                 # buffered part is because otherwise get "Unread result found" error when you connection.commit without cursor.fetchAll
-                self.cursor = self.connection.cursor(dictionary=True, buffered=True)
+                state.cursor = state.connection.cursor(dictionary=True, buffered=buffered)
+
+                state.cursor.execute(f'CREATE DATABASE IF NOT EXISTS {get(name, "database")} CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci;')
+                state.cursor.execute(f'use {get(name, "database")};')
 
-                self.cursor.execute(f'CREATE DATABASE IF NOT EXISTS {get(name, "database")} CHARACTER SET utf8 COLLATE utf8_general_ci;')
-                self.cursor.execute(f'use {get(name, "database")};')
+                # writes are committed in groups, so a connection can be in a transaction for a while. this way its reads still see what other nodes committed since.
+                state.cursor.execute('set session transaction isolation level read committed;')
 
         except Exception as e:
             self.handleException(e)
 
+    @property
+    def connection(self):
+        return self.getState().connection
+
+    @property
+    def cursor(self):
+        return self.getState().cursor
+
+    def migrate(self, migrations):
+        self.execute('create table if not exists schemaVersion ( version integer )')
+
+        row = self.getFirst('schemaVersion', 'version', None)
+
+        version = 0
+
+        if row:
+            version = row['version']
+        else:
+            self.insert('schemaVersion', {'version': 0})
+
+        # migrations are run in order and each one only once
+        for i, migration in enumerate(migrations):
+            newVersion = i + 1
+
+            if newVersion <= version:
+                continue
+
+            logging.info(f'Upgrading database to version {newVersion}')
+
+            state = self.getState()
+
+            # a failed step rolls back and stops the upgrade, so it's tried again next time
+            try:
+                with self.transaction():
+                    # otherwise sqlite runs create and alter statements outside the transaction
+                    if self.type == 'sqlite' and not state.connection.in_transaction:
+                        self.execute('begin')
+
+                    migration(self)
+                    self.execute('update schemaVersion set version = ?', (newVersion,))
+            except:
+                logging.error(f'Could not upgrade the database to version {newVersion}')
+
+                raise
+
+    def columnExists(self, table, column):
+        result = False
+
+        if self.type == 'sqlite':
+            self.executeWithRetries(f'pragma table_info({table});')
+
+            for row in self.cursor.fetchall():
+                if row['name'] == column:
+                    result = True
+                    break
+        elif self.type == 'mysql':
+            row = self.getFirst('information_schema.columns', 'column_name', 'table_schema = database() and table_name = ? and column_name = ?', (table, column))
+
+            if row:
+                result = True
+
+        return result
+
+    def setPragmas(self, cursor):
+        # wal lets readers in other processes keep going while one process writes
+        cursor.execute('pragma journal_mode = wal;')
+        cursor.execute(f'pragma busy_timeout = {int(self.busyTimeout)};')
+        # safe with wal. only the last commits can be lost if the machine loses power.
+        cursor.execute('pragma synchronous = normal;')
+        # negative means kilobytes
+        cursor.execute(f'pragma cache_size = -{int(self.cacheKilobytes)};')
+        cursor.execute('pragma temp_store = memory;')
+
     def handleException(self, e):
         helpers.handleException(e, 'Database error')
 
+    # closes the connections of all threads
     def close(self):
-        if self.connection:
-            self.connection.commit()
-            self.cursor.close()
-            self.connection.close()
+        self.stopFlushing.set()
+
+        if self.flushThread:
+            self.flushThread.join()
+
+        self.flushThread = None
+        self.stopFlushing = threading.Event()
+
+        with self.statesLock:
+            states = self.states
+            self.states = []
+
+        for state in states:
+            if not state.connection:
+                continue
+
+            self.commit(state)
+
+            try:
+                state.cursor.close()
+                state.connection.close()
+            except Exception as e:
+                self.handleException(e)
+
+            state.connection = None
+            state.cursor = None
+
+        self.local = threading.local()
 
     def __init__(self, name=None, type='sqlite'):
         self.type = type
-        self.connection = None
-        self.cursor = None
+        self.name = None
+        self.local = threading.local()
+        self.states = []
+        self.statesLock = threading.Lock()
+        # group commit. by default every write is committed right away.
+        self.commitEvery = 1
+        self.millisecondsBetweenCommits = 0
+        # longest a write waits for its commit when millisecondsBetweenCommits isn't set
+        self.defaultMillisecondsBetweenCommits = 1000
+        self.flushThread = None
+        self.stopFlushing = threading.Event()
+        self.busyTimeout = 30000
+        self.cacheKilobytes = 20000
+        self.lockErrors = 0
+        self.secondsWaitingForLocks = 0
 
         self.stringKeyType = 'text'
+        self.autoIncrementKeyType = 'integer primary key'
+        self.binaryType = 'blob'
 
         if self.type == 'mysql':
             self.stringKeyType = 'varchar(100)'
+            self.autoIncrementKeyType = 'integer primary key auto_increment'
+            self.binaryType = 'longblob'
         
-        self.open(name)
\ No newline at end of file
+        self.open(name)
+
+# sqlite by default. mysql lets several machines share the same database.
+def openDatabase(options):
+    if options.get('databaseType', 'sqlite') == 'mysql':
+        credentials = {}
+
+        helpers.setOptions('user-data/credentials/credentials.ini', credentials, '')
+
+        return Database(credentials.get('mysql', {}), 'mysql')
+
+    return Database('user-data/database.sqlite')
@@ -0,0 +1,95 @@
+import os
+import logging
+
+from . import helpers
+from . import stored_json
+
+from .helpers import get
+from .output_file import OutputFile
+from .information_finder import profileFields, companyFields, getCsvValues
+
+# writes output.csv and companies.csv from the result table in one pass
+class Export:
+    def run(self):
+        where = None
+        parameters = None
+
+        watermark = self.getWatermark()
+
+        if self.full:
+            logging.info('Exporting all results')
+
+            for fileName in [self.outputFile.fileName, self.companiesOutputFile.fileName]:
+                helpers.removeFile(fileName)
+        else:
+            logging.info(f'Exporting results added since {watermark}')
+
+            # greater or equal so rows added in the same second as the last export aren't missed. duplicates are skipped anyway.
+            where = 'gmTimestamp >= ?'
+            parameters = (watermark,)
+
+        rowsExported = 0
+        newWatermark = watermark
+
+        for row in self.database.iterate('result', 'id, keyword, gmTimestamp, json', where, parameters, orderBy='gmTimestamp', orderType='asc'):
+            # rows that are already exported don't need to be decompressed
+            item = stored_json.StoredJson(row['json'])
+
+            if not self.isExported(get(row, 'id')):
+                rowsExported += self.exportItem(item.get(), get(row, 'keyword'))
+
+            if row['gmTimestamp'] and row['gmTimestamp'] > newWatermark:
+                newWatermark = row['gmTimestamp']
+
+            if rowsExported and rowsExported % 10000 == 0:
+                logging.info(f'Exported {rowsExported} rows so far')
+
+        self.outputFile.close()
+        self.companiesOutputFile.close()
+
+        self.database.insert('setting', {'name': 'lastExport', 'value': str(newWatermark)})
+
+        logging.info(f'Exported {rowsExported} rows')
+
+    def exportItem(self, item, keyword):
+        result = 0
+
+        if self.isCompany(item):
+            return self.toCsvFile(item, keyword, companyFields, self.companiesOutputFile)
+
+        result += self.toCsvFile(item, keyword, profileFields, self.outputFile)
+
+        # the list of companies from that profile
+        for company in get(item, 'companies'):
+            result += self.toCsvFile(company, keyword, companyFields, self.companiesOutputFile)
+
+        return result
+
+    def toCsvFile(self, item, keyword, fields, outputFile):
+        id = get(item, 'id')
+
+        if outputFile.contains(id):
+            return 0
+
+        outputFile.write(getCsvValues(item, keyword, fields), id)
+
+        return 1
+
+    # a profile's companies are written at the same time as the profile
+    def isExported(self, id):
+        return self.outputFile.contains(id) or self.companiesOutputFile.contains(id)
+
+    def isCompany(self, item):
+        return '/company/' in get(item, 'linkedin url')
+
+    def getWatermark(self):
+        row = self.database.getFirst('setting', 'value', 'name = ?', ('lastExport',))
+
+        return int(get(row, 'value') or 0)
+
+    def __init__(self, database, outputDirectory, full=False):
+        self.database = database
+        self.full = full
+
+        self.outputFile = OutputFile(os.path.join(outputDirectory, 'output.csv'), profileFields)
+        self.companiesOutputFile = OutputFile(os.path.join(outputDirectory, 'companies.csv'), companyFields)
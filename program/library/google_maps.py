@@ -1,11 +1,15 @@
 import sys
 import logging
 import time
+import asyncio
 
 from . import helpers
 
 from .helpers import get
 from .api import Api
+from .async_api import AsyncApi
+from .host_scheduler import hostScheduler
+from .known_ids import KnownIds
 
 class GoogleMaps:
     def search(self, searchItem):
@@ -16,58 +20,81 @@ class GoogleMaps:
         places = self.getPages(searchItem, f'/maps/api/place/textsearch/json?query={keyword}&key={self.apiKey}')
 
         names = []
+        candidates = []
+
+        # check the whole list at once
+        existingIds = self.knownIds.existing(helpers.getDomainName(self.url), [item.get('place_id', '') for item in places])
 
         for item in places:
-            if self.inDatabase(item.get('place_id', '')):
+            if item.get('place_id', '') in existingIds:
+                logging.info(f'Skipping. Already have {item.get("place_id", "")} in the database.')
                 continue
 
-            details = self.getPlaceDetails(item)
-            
-            phone = details.get('international_phone_number', '')
-
             name = item.get('name', '')
 
             # to avoid duplicates
             if name in names:
                 continue
-            
-            names.append(name)                
 
-            if not phone:
-                continue
+            names.append(name)
+            candidates.append(item)
 
-            result = {
-                'id': item.get('place_id', ''),
-                'site': helpers.getDomainName(self.url),
-                'name': name,
-                'email': '',
-                'phone': phone,
-                'address': get(item, 'formatted_address'),
-                'url': details.get('website', ''),
-                'google maps url': 'https://www.google.com/maps/place/?q=place_id:' + item.get('place_id', '')
-            }
-
-            results.append(result)
-
-            logging.info(f'Site: maps.google.com. Keyword: {keyword}. Results: {len(results)}. Name: {name}. Phone: {phone}.')
-            
-            maximum = searchItem.get('maximumNewResults', self.options['maximumNewResults'])
-            maximum = int(maximum)
+        maximum = searchItem.get('maximumNewResults', self.options['maximumNewResults'])
+        maximum = int(maximum)
 
-            if len(results) >= maximum:
-                logging.debug(f'Stopping for this keyword. Got {len(results)} new results.')
-                break
+        while candidates and len(results) < maximum and not helpers.stopEvent.is_set():
+            # only as many as could still be needed, so it doesn't get much more than before
+            batch = candidates[:maximum - len(results)]
+            candidates = candidates[len(batch):]
+
+            for item, details in zip(batch, self.getPlaceDetails(batch)):
+                phone = details.get('international_phone_number', '')
+
+                if not phone:
+                    continue
+
+                name = item.get('name', '')
+
+                result = {
+                    'id': item.get('place_id', ''),
+                    'site': helpers.getDomainName(self.url),
+                    'name': name,
+                    'email': '',
+                    'phone': phone,
+                    'address': get(item, 'formatted_address'),
+                    'url': details.get('website', ''),
+                    'google maps url': 'https://www.google.com/maps/place/?q=place_id:' + item.get('place_id', '')
+                }
+
+                results.append(result)
+
+                logging.info(f'Site: maps.google.com. Keyword: {keyword}. Results: {len(results)}. Name: {name}. Phone: {phone}.')
+
+                if len(results) >= maximum:
+                    logging.debug(f'Stopping for this keyword. Got {len(results)} new results.')
+                    break
 
         return results
 
-    def getPlaceDetails(self, place):
-        placeId = place.get('place_id', '')
+    # gets the details of all the places at the same time. results are in the same order as the places.
+    def getPlaceDetails(self, places):
+        # kept for the whole run so the connections to the api stay open between searches
+        if not self.loop:
+            self.loop = asyncio.new_event_loop()
 
-        j = self.api.get(f'/maps/api/place/details/json?place_id={placeId}&fields=name,international_phone_number,website&key={self.apiKey}')
+        return self.loop.run_until_complete(self.getPlaceDetailsAsync(places))
 
-        self.handleError(j)
+    async def getPlaceDetailsAsync(self, places):
+        results = []
+
+        urls = [f'/maps/api/place/details/json?place_id={place.get("place_id", "")}&fields=name,international_phone_number,website&key={self.apiKey}' for place in places]
+
+        for j in await self.asyncApi.getAll(urls):
+            self.handleError(j)
 
-        return j.get('result', {})
+            results.append(j.get('result', {}))
+
+        return results
 
     def getPages(self, searchItem, url):
         results = []
@@ -83,11 +110,17 @@ class GoogleMaps:
                 nextPageTokenPart = f'&pagetoken={nextPageToken}'
 
             for attempt in range(0, 10):
+                # gives the next page time to get ready
+                if not hostScheduler.acquire('googleMapsPage'):
+                    return results
+
                 j = self.api.get(f'{url}{nextPageTokenPart}')
 
                 # might need to wait for next page to be ready
                 if j.get('status', '') == 'INVALID_REQUEST':
-                    time.sleep(5)
+                    if not helpers.wait(5):
+                        break
+
                     continue
                 
                 break
@@ -111,9 +144,6 @@ class GoogleMaps:
                 # no more results
                 break
 
-            # give time for next page to get ready
-            time.sleep(1)
-
         return results
     
     def inDatabase(self, id):
@@ -121,9 +151,7 @@ class GoogleMaps:
         
         site = 'maps.google.com'
         
-        row = self.database.getFirst('result', 'id', f"site = '{site}' and id = '{id}'", '', '')
-
-        if row:
+        if self.knownIds.contains(site, id):
             logging.info(f'Skipping. Already have {id} in the database.')
             result = True
 
@@ -134,9 +162,23 @@ class GoogleMaps:
             error = j.get('error_message', '')
             logging.error(f'Google Maps: {error}')
 
-    def __init__(self, options, credentials, database):
+    def close(self):
+        if not self.loop:
+            return
+
+        # the session belongs to this event loop
+        self.loop.run_until_complete(self.asyncApi.close())
+        self.loop.close()
+
+        self.loop = None
+
+    def __init__(self, options, credentials, database, knownIds=None):
         self.options = options
         self.database = database
+        self.knownIds = knownIds
+
+        if not self.knownIds:
+            self.knownIds = KnownIds(self.database)
 
         self.apiKey = helpers.getNested(credentials, ['google maps', 'apiKey'])
 
@@ -147,4 +189,7 @@ class GoogleMaps:
         
         self.url = 'https://maps.google.com'
         self.api = Api('https://maps.googleapis.com')
-        self.api.headers = {}
\ No newline at end of file
+        self.api.headers = {}
+        self.asyncApi = AsyncApi('https://maps.googleapis.com')
+        self.asyncApi.headers = {}
+        self.loop = None
\ No newline at end of file
@@ -4,6 +4,8 @@ import io
 import datetime
 import logging
 import traceback
+import threading
+import time
 
 def get(item, key):
     if not item:
@@ -535,42 +537,52 @@ def getDateStringSecondsAgo(secondsAgo, useGmTime):
     return str(result)
 
 
-def wait(seconds):
-    import datetime
+# seconds since 1970 in gmt
+def getTimestampSecondsAgo(secondsAgo=0):
     import time
-    
+
+    return int(time.time()) - int(secondsAgo)
+
+
+# set it to make every wait return right away. for example when stopping.
+stopEvent = threading.Event()
+
+# how often long waits log the time remaining
+secondsBetweenWaitUpdates = 10
+
+# returns False if the wait was cancelled
+def wait(seconds, event=None):
     seconds = int(seconds)
 
     if '--debug' in sys.argv:
         seconds = 3
 
-    started = datetime.datetime.utcnow()
+    if not event:
+        event = stopEvent
 
     logging.info(f'Waiting {seconds} seconds')
 
-    while True:
-        elapsed = datetime.datetime.utcnow() - started
-        elapsed = elapsed.total_seconds()
+    ends = time.monotonic() + seconds
 
-        remaining = seconds - elapsed
+    while True:
+        remaining = ends - time.monotonic()
 
         if remaining <= 0:
             break
 
-        remaining = '{0:.1f}'.format(remaining)
+        # sleeps until the time is up or the event is set
+        if event.wait(min(remaining, secondsBetweenWaitUpdates)):
+            logging.info('Stopped waiting')
+            return False
 
-        if seconds > 5:
-            print(f'{remaining} seconds remaining             ', end='\r')
+        remaining = ends - time.monotonic()
 
-        time.sleep(0.05)
+        if remaining > 0:
+            logging.info(f'{remaining:.0f} seconds remaining')
 
-    if seconds > 5:
-        print('')
+    return True
 
 def waitUntil(date):
-    import datetime
-    import time
-    
     difference = date - datetime.datetime.utcnow()
 
     seconds = difference.total_seconds()
@@ -581,7 +593,7 @@ def waitUntil(date):
     if '--debug' in sys.argv:
         seconds = 3
 
-    time.sleep(seconds)
+    return not stopEvent.wait(max(seconds, 0))
 
 def getDomainName(url):
     result = ''
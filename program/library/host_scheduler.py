@@ -0,0 +1,121 @@
+import time
+import random
+import logging
+import threading
+
+from contextlib import contextmanager
+
+from . import helpers
+
+# limits how many requests can be in progress at the same time for each host
+# and how often each host or kind of request can be used
+class HostScheduler:
+    @contextmanager
+    def limit(self, host):
+        semaphore = self.getSemaphore(host)
+
+        semaphore.acquire()
+
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def getSemaphore(self, host):
+        with self.lock:
+            if not host in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(max(int(self.maximumConcurrentRequests), 1))
+
+            return self.semaphores[host]
+
+    # waits for a permit. the name is a host or a kind of request like linkedInSearchPage.
+    # the time is reserved before waiting, so threads waiting for the same bucket take turns and other threads keep working.
+    # returns False when stopping. the caller shouldn't send the request then.
+    def acquire(self, name):
+        if helpers.stopEvent.is_set():
+            return False
+
+        seconds = self.reserve(name)
+
+        if seconds <= 0:
+            return True
+
+        logging.info(f'Waiting {seconds:.1f} seconds for {name}')
+
+        return not helpers.stopEvent.wait(seconds)
+
+    # returns how long to wait until the permit is ready
+    def reserve(self, name):
+        with self.lock:
+            bucket = self.buckets.get(name)
+
+            if not bucket:
+                return 0
+
+            if self.sharedTimes is not None:
+                return self.reserveShared(name, bucket)
+
+            now = time.time()
+
+            ready = max(bucket['next'], now)
+
+            # one permit at a time, so the gap between requests is the same as before
+            bucket['next'] = ready + random.uniform(bucket['minimum'], bucket['maximum'])
+
+            return ready - now
+
+    # same as reserve but the times are shared with the other worker processes
+    def reserveShared(self, name, bucket):
+        with self.sharedLock:
+            now = time.time()
+
+            ready = max(self.sharedTimes.get(name, 0), now)
+
+            self.sharedTimes[name] = ready + random.uniform(bucket['minimum'], bucket['maximum'])
+
+            return ready - now
+
+    # sharedTimes and sharedLock come from a multiprocessing manager. then all the processes together keep to the rate limits.
+    def share(self, sharedTimes, sharedLock):
+        with self.lock:
+            self.sharedTimes = sharedTimes
+            self.sharedLock = sharedLock
+
+    # format: name=minimum-maximum seconds between permits, separated by commas. for example "linkedInSearchPage=5-10, api.salesql.com=1".
+    def setRateLimits(self, string):
+        with self.lock:
+            self.buckets = {}
+
+            for part in string.split(','):
+                name = helpers.findBetween(part, '', '=').strip()
+                value = helpers.findBetween(part, '=', '').strip()
+
+                if not name or not '=' in part:
+                    continue
+
+                try:
+                    minimum = float(helpers.findBetween(value, '', '-'))
+                    maximum = minimum
+
+                    if '-' in value:
+                        maximum = float(helpers.findBetween(value, '-', ''))
+                except ValueError:
+                    logging.error(f'Invalid rate limit: {part.strip()}')
+                    continue
+
+                self.buckets[name] = {
+                    'minimum': minimum,
+                    'maximum': max(minimum, maximum),
+                    'next': 0
+                }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.semaphores = {}
+        self.buckets = {}
+        self.sharedTimes = None
+        self.sharedLock = None
+        self.maximumConcurrentRequests = 2
+
+# shared by all Api objects
+hostScheduler = HostScheduler()
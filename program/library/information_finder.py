@@ -4,102 +4,306 @@ import logging
 import datetime
 import json
 import re
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
 
 # pip packages
 import lxml.html as lh
 
 from . import helpers
+from . import stored_json
 
 from .helpers import get
 from .api import Api
+from .host_scheduler import hostScheduler
 from .website import Website
 from .work import LinkedIn
+from .work import getPositionsAsString
 from .google_maps import GoogleMaps
 from .domain_finder import DomainFinder
+from .known_ids import KnownIds
+from .company_cache import CompanyCache
+from .output_file import OutputFile
+from .output_file import ShardedOutputFile
+from .output_file import Manifest
+from .pipeline import Pipeline
+from .checkpoint import Checkpoint
+
+# fields for regular profiles
+profileFields = ['site', 'keyword', 'first name', 'last name', 'email', 'phone', 'headline', 'job title', 'company', 'summary', 'industry', 'location', 'country', 'positions', 'school', 'field of study', 'id', 'linkedin url']
+
+# fields for companies
+companyFields = ['site', 'keyword', 'name', 'website', 'email', 'phone', 'city', 'region', 'country', 'address', 'headline', 'minimum employees', 'maximum employees', 'industry', 'company type', 'id', 'linkedin url', 'google maps url', 'facebook', 'twitter', 'instagram', 'youtube', 'media links']
+
+def getCsvValues(item, keyword, fields):
+    values = [item.get('site', ''), keyword]
+
+    for field in fields[2:]:
+        value = ''
+        
+        if field == 'positions':
+            value = getPositionsAsString(item)
+        else:
+            value = item.get(field, '')
+
+        values.append(value)
+
+    return values
 
 class InformationFinder:
-    def run(self, inputRow, outputDirectory):
+    def run(self, inputRow, outputDirectory, inputFile=''):
         if self.isDone(inputRow):
             return
 
+        # for splitting the output by input file
+        self.inputFile = inputFile
+
         self.outputFile = os.path.join(outputDirectory, 'output.csv')
         self.companiesOutputFile = os.path.join(outputDirectory, 'companies.csv')
 
-        newItems = self.linkedIn.search(inputRow, getDetails=True)
+        checkpoint = None
+
+        # only searches have pages to resume
+        if not self.linkedIn.isProfileUrl(inputRow) and not self.linkedIn.isCompanyUrl(inputRow):
+            checkpoint = Checkpoint(self.options, self.database, inputRow)
+
+        resultsFound = 0
 
-        newItems = self.addGoogleMapsInformation(inputRow, newItems)
-        newItems = self.addGoogleInformation(inputRow, newItems)
+        if checkpoint:
+            resultsFound = len(checkpoint.enriched)
+
+        # each result is written as soon as it's enriched instead of after the whole search
+        for newItem in self.pipeline.run(self.getSource(inputRow, checkpoint), self.getStages(inputRow, resultsFound)):
+            resultsFound += 1
+
+            logging.info(f'Result {resultsFound}. Site: {get(newItem, "site")}. Keyword: {get(inputRow, "keyword")}. Name: {self.linkedIn.getName(newItem)}.')
 
-        for i, newItem in enumerate(newItems):
-            logging.info(f'Result {i + 1} of {len(newItems)}. Site: {get(newItem, "site")}. Keyword: {get(inputRow, "keyword")}. Name: {self.linkedIn.getName(newItem)}.')
             self.output(inputRow, newItem, outputDirectory)
 
-        self.markDone(inputRow, newItems)
+            if checkpoint:
+                checkpoint.addEnriched(get(newItem, 'id'))
 
-    def addGoogleInformation(self, inputRow, newItems):
-        import re
-        
-        logging.info('Adding information from company websites')
+        with self.database.transaction():
+            self.markDone(inputRow, resultsFound)
 
-        if get(inputRow, 'search type') == 'companies' or self.linkedIn.isCompanyUrl(inputRow):
-            newItems = [
-                {
-                    'companies': newItems
-                }
-            ]
-        
-        for i, newItem in enumerate(newItems):
-            for j, company in enumerate(get(newItem, 'companies')):
-                logging.info(f'Adding to result {i + 1} of {len(newItems)}. Company {j + 1} of {len(get(newItem, "companies"))}: {get(company, "name")}')
+            if checkpoint:
+                checkpoint.delete()
+
+    # search hits for keywords. the details for profile and company url's.
+    def getSource(self, inputRow, checkpoint=None):
+        if self.linkedIn.isProfileUrl(inputRow) or self.linkedIn.isCompanyUrl(inputRow):
+            return self.linkedIn.search(inputRow)
+
+        return self.linkedIn.iterateSearchResults(inputRow, checkpoint)
+
+    def getStages(self, inputRow, resultsFound=0):
+        stages = []
+
+        if not self.linkedIn.isProfileUrl(inputRow) and not self.linkedIn.isCompanyUrl(inputRow):
+            stages.append(lambda items: self.linkedIn.iterateDetails(inputRow, items, resultsFound))
+
+            if self.linkedIn.useSalesql:
+                stages.append(lambda items: self.linkedIn.iterateContactInformation(inputRow, items))
+
+        stages.append(lambda items: self.iterateGoogleMapsInformation(inputRow, items))
+        stages.append(lambda items: self.iterateGoogleInformation(items))
 
+        return stages
+
+    # yields jobs. each one has the result and the state of its companies.
+    def iterateGoogleMapsInformation(self, inputRow, items):
+        for item in items:
+            job = {
+                'item': item,
+                'toLookUp': [],
+                'inProgress': []
+            }
+
+            for company in self.getCompanies(inputRow, item):
                 if self.isInOutputFile(company):
                     continue
 
-                if not get(company, 'website'):
-                    logging.debug('Skipping. No website.')
+                if self.applyCachedInformation(company):
                     continue
 
-                domain = helpers.getDomainName(get(company, 'website'))
+                # same company can appear in several results. only the first one looks it up.
+                if self.startCompany(company):
+                    job['toLookUp'].append(company)
+                else:
+                    job['inProgress'].append(company)
+
+            logging.info(f'Adding information from Google Maps to {len(job["toLookUp"])} companies for {self.linkedIn.getName(item)}')
 
-                logging.info(f'Looking for contact information on {domain}')
+            self.forEachCompany(self.tryAddGoogleMapsInformation, job['toLookUp'])
 
-                basicCompanyName = self.getBasicCompanyName(get(company, 'name'))
+            yield job
 
-                company = self.addContactInformationFromDomain(company, domain)
-                company = self.addMediaLinks(company, domain)
+    def iterateGoogleInformation(self, jobs):
+        for job in jobs:
+            logging.info(f'Adding information from company websites to {len(job["toLookUp"])} companies for {self.linkedIn.getName(job["item"])}')
 
-                parameters ={
-                    'partOfQuery': ' ' + get(company, 'website'),
-                }
+            self.forEachCompany(self.tryFinishCompany, job['toLookUp'])
 
-                logging.info(f'Looking for the company\'s social media pages')
-                
-                socialMediaDomains = [
-                    'facebook.com',
-                    'twitter.com',
-                    'youtube.com'
-                ]
+            # earlier results looked these up already unless another worker has them
+            for company in job['inProgress']:
+                if not self.applyCachedInformation(company):
+                    self.tryAddInformationToCompany(company)
 
-                for socialMediaDomain in socialMediaDomains:
-                    basicDomain = helpers.findBetween(socialMediaDomain, '', '.')
+            yield job['item']
 
-                    # already have it?
-                    if get(company, basicDomain):
-                        continue
+    def getCompanies(self, inputRow, item):
+        if get(inputRow, 'search type') == 'companies' or self.linkedIn.isCompanyUrl(inputRow):
+            return [item]
+
+        return get(item, 'companies')
 
-                    # want social media page to contain the website
-                    googleResult = self.domainFinder.checkExternalDomains(domain, basicCompanyName, parameters, socialMediaDomain)
+    # each company needs several independent requests, so do many companies at once
+    def forEachCompany(self, function, companies):
+        if self.executor and len(companies) > 1:
+            futures = [self.executor.submit(function, company) for company in companies]
 
-                    for key in googleResult:
-                        nameToUse = helpers.findBetween(key, '', '.')
+            for future in futures:
+                future.result()
+        else:
+            for company in companies:
+                function(company)
 
-                        # need to use index so it will still be modified after leave this loop
-                        company[nameToUse] = googleResult[key]
+    def applyCachedInformation(self, company):
+        cachedCompany = self.companyCache.get(get(company, 'id'))
 
-        if get(inputRow, 'search type') == 'companies' or self.linkedIn.isCompanyUrl(inputRow):
-            newItems = newItems[0]['companies']
+        if not cachedCompany:
+            return False
+
+        logging.info(f'Using saved information for {get(company, "name")}')
+
+        self.companyCache.apply(company, cachedCompany)
+
+        return True
+
+    def startCompany(self, company):
+        id = get(company, 'id')
+
+        if not id:
+            return True
+
+        with self.lock:
+            if id in self.companiesInProgress:
+                return False
+
+            self.companiesInProgress.add(id)
+
+        return True
+
+    def tryAddGoogleMapsInformation(self, company):
+        try:
+            self.addGoogleMapsInformation(company)
+        except Exception as e:
+            helpers.handleException(e)
+
+    def tryFinishCompany(self, company):
+        try:
+            self.addGoogleInformation(company)
+
+            self.companyCache.put(company)
+        except Exception as e:
+            helpers.handleException(e)
+        finally:
+            with self.lock:
+                self.companiesInProgress.discard(get(company, 'id'))
+
+    def tryAddInformationToCompany(self, company):
+        try:
+            self.addGoogleMapsInformation(company)
+            self.addGoogleInformation(company)
+
+            self.companyCache.put(company)
+        except Exception as e:
+            helpers.handleException(e)
+
+    # each thread needs its own objects because they keep state between requests
+    def getThreadObjects(self):
+        objects = getattr(self.threadObjects, 'objects', None)
+
+        if objects:
+            return objects
+
+        objects = {
+            'api': Api(''),
+            'googleMaps': GoogleMaps(self.options, self.credentials, self.database, self.knownIds),
+            'domainFinder': DomainFinder(self.options)
+        }
+
+        # only want to get the proxy list once
+        with self.lock:
+            if self.proxies is None:
+                objects['domainFinder'].getRandomProxy()
+                self.proxies = objects['domainFinder'].proxies or []
+
+            objects['domainFinder'].proxies = self.proxies
+
+            # so close() can get to the objects of every thread
+            self.allThreadObjects.append(objects)
+
+        self.threadObjects.objects = objects
+
+        return objects
+
+    @property
+    def api(self):
+        return self.getThreadObjects()['api']
+
+    @property
+    def googleMaps(self):
+        return self.getThreadObjects()['googleMaps']
+
+    @property
+    def domainFinder(self):
+        return self.getThreadObjects()['domainFinder']
+
+    def addGoogleInformation(self, company):
+        if not get(company, 'website'):
+            logging.debug('Skipping. No website.')
+            return company
+
+        domain = helpers.getDomainName(get(company, 'website'))
+
+        logging.info(f'Looking for contact information on {domain}')
+
+        basicCompanyName = self.getBasicCompanyName(get(company, 'name'))
+
+        company = self.addContactInformationFromDomain(company, domain)
+        company = self.addMediaLinks(company, domain)
 
-        return newItems
+        parameters ={
+            'partOfQuery': ' ' + get(company, 'website'),
+        }
+
+        logging.info(f'Looking for the company\'s social media pages')
+        
+        socialMediaDomains = [
+            'facebook.com',
+            'twitter.com',
+            'youtube.com'
+        ]
+
+        for socialMediaDomain in socialMediaDomains:
+            basicDomain = helpers.findBetween(socialMediaDomain, '', '.')
+
+            # already have it?
+            if get(company, basicDomain):
+                continue
+
+            # want social media page to contain the website
+            googleResult = self.domainFinder.checkExternalDomains(domain, basicCompanyName, parameters, socialMediaDomain)
+
+            for key in googleResult:
+                nameToUse = helpers.findBetween(key, '', '.')
+
+                # need to use index so it will still be modified after leave this loop
+                company[nameToUse] = googleResult[key]
+
+        return company
 
     def addContactInformationFromDomain(self, company, domain):
         url = self.domainFinder.search(f'site:{domain} contact', 1, True)
@@ -310,73 +514,54 @@ class InformationFinder:
 
         return company
     
-    def addGoogleMapsInformation(self, inputRow, newItems):
-        logging.info('Adding information from Google Maps')
-
-        if get(inputRow, 'search type') == 'companies' or self.linkedIn.isCompanyUrl(inputRow):
-            newItems = [
-                {
-                    'companies': newItems
-                }
-            ]
-
-        for i, newItem in enumerate(newItems):
-            for j, company in enumerate(get(newItem, 'companies')):
-                logging.info(f'Adding to result {i + 1} of {len(newItems)}. Company {j + 1} of {len(get(newItem, "companies"))}: {get(company, "name")}')
-
-                if self.isInOutputFile(company):
-                    continue
-
-                fields = ['city', 'region', 'country']
-
-                values = []
+    def addGoogleMapsInformation(self, company):
+        fields = ['city', 'region', 'country']
 
-                for field in fields:
-                    values.append(get(company, field))
+        values = []
 
-                keyword = ', '.join(values)
-                keyword = get(company, 'name') + ' ' + keyword
+        for field in fields:
+            values.append(get(company, field))
 
-                googleMapSearchItem = {
-                    'keyword': keyword
-                }
+        keyword = ', '.join(values)
+        keyword = get(company, 'name') + ' ' + keyword
 
-                googleMapResults = self.googleMaps.search(googleMapSearchItem)
+        googleMapSearchItem = {
+            'keyword': keyword
+        }
 
-                existingCompanyName = self.getBasicCompanyName(get(company, 'name'))
-                
-                resultToUse = None
+        googleMapResults = self.googleMaps.search(googleMapSearchItem)
 
-                for googleMapResult in googleMapResults:
-                    companyNameFromGoogleMaps = self.getBasicCompanyName(get(googleMapResult, 'name'))
+        existingCompanyName = self.getBasicCompanyName(get(company, 'name'))
+        
+        resultToUse = None
 
-                    if companyNameFromGoogleMaps == existingCompanyName:
-                        resultToUse = googleMapResult
-                        break
+        for googleMapResult in googleMapResults:
+            companyNameFromGoogleMaps = self.getBasicCompanyName(get(googleMapResult, 'name'))
 
-                if not resultToUse:
-                    logging.info(f'No matches on Google Maps for {get(company, "name")}')
-                    continue
+            if companyNameFromGoogleMaps == existingCompanyName:
+                resultToUse = googleMapResult
+                break
 
-                logging.info(f'Found matching result on Google Maps: {get(googleMapResult, "name")}')
+        if not resultToUse:
+            logging.info(f'No matches on Google Maps for {get(company, "name")}')
+            return company
 
-                toMerge = ['phone', 'address', 'url', 'google maps url']
+        logging.info(f'Found matching result on Google Maps: {get(resultToUse, "name")}')
 
-                # add if doesn't exist
-                for field in toMerge:
-                    nameToUse = field
+        toMerge = ['phone', 'address', 'url', 'google maps url']
 
-                    if field == 'url':
-                        nameToUse = 'website'
+        # add if doesn't exist
+        for field in toMerge:
+            nameToUse = field
 
-                    if not get(company, nameToUse):
-                        logging.info(f'Adding {nameToUse} from Google Maps: {get(googleMapResult, field)}')
-                        company[nameToUse] = get(googleMapResult, field)
+            if field == 'url':
+                nameToUse = 'website'
 
-        if get(inputRow, 'search type') == 'companies' or self.linkedIn.isCompanyUrl(inputRow):
-            newItems = newItems[0]['companies']
+            if not get(company, nameToUse):
+                logging.info(f'Adding {nameToUse} from Google Maps: {get(resultToUse, field)}')
+                company[nameToUse] = get(resultToUse, field)
 
-        return newItems
+        return company
 
     def output(self, inputRow, newItem, outputDirectory):
         self.toDatabase(inputRow, newItem)
@@ -386,18 +571,15 @@ class InformationFinder:
         if not newItem:
             return
 
-        # fields for regular profiles
-        fields = ['site', 'keyword', 'first name', 'last name', 'email', 'phone', 'headline', 'job title', 'company', 'summary', 'industry', 'location', 'country', 'positions', 'school', 'field of study', 'id', 'linkedin url']
-
-        # fields for companies
-        companyFields = ['site', 'keyword', 'name', 'website', 'email', 'phone', 'city', 'region', 'country', 'address', 'headline', 'minimum employees', 'maximum employees', 'industry', 'company type', 'id', 'linkedin url', 'google maps url', 'facebook', 'twitter', 'instagram', 'youtube', 'media links']
+        if not self.options.get('writeCsvFiles', 1):
+            return
 
         # put companies in companies.csv
         if get(inputRow, 'search type') == 'companies' or self.linkedIn.isCompanyUrl(newItem):
             self.toCsvFile(inputRow, newItem, companyFields, self.companiesOutputFile)
         # put regular profiles in output.csv
         else:
-            self.toCsvFile(inputRow, newItem, fields, self.outputFile)
+            self.toCsvFile(inputRow, newItem, profileFields, self.outputFile)
             
             # put the list of companies from that profile in companies.csv
             for company in get(newItem, 'companies'):
@@ -405,28 +587,17 @@ class InformationFinder:
 
 
     def toCsvFile(self, inputRow, newItem, fields, outputFile):
-        helpers.makeDirectory(os.path.dirname(outputFile))
-
-        # write header
-        if not os.path.exists(outputFile):
-            helpers.toFile(','.join(fields), outputFile)
-
         if self.isInOutputFile(newItem):
             return
 
-        values = [newItem.get('site', ''), inputRow.get('keyword', '')]
+        values = getCsvValues(newItem, inputRow.get('keyword', ''), fields)
 
-        for field in fields[2:]:
-            value = ''
-            
-            if field == 'positions':
-                value = self.linkedIn.getPositionsAsString(newItem)
-            else:
-                value = newItem.get(field, '')
+        outputFile = self.getOutputFile(outputFile, fields)
 
-            values.append(value)
-
-        helpers.appendCsvFile(values, outputFile)
+        if isinstance(outputFile, ShardedOutputFile):
+            outputFile.write(values, newItem.get('id', ''), self.inputFile)
+        else:
+            outputFile.write(values, newItem.get('id', ''))
 
     def toDatabase(self, inputRow, newItem):
         item = {
@@ -435,10 +606,12 @@ class InformationFinder:
             'id': newItem.get('id', ''),
             'name': self.linkedIn.getName(newItem),
             'gmDate': str(datetime.datetime.utcnow()),
-            'json': json.dumps(newItem)
+            'gmTimestamp': helpers.getTimestampSecondsAgo(),
+            'json': stored_json.encode(newItem, self.options.get('compressJson', 1))
         }
 
         self.database.insert('result', item)
+        self.knownIds.add(item['site'], item['id'])
 
     def isInOutputFile(self, newItem):
         result = False
@@ -446,17 +619,57 @@ class InformationFinder:
         files = [self.outputFile, self.companiesOutputFile]
 
         for file in files:
-            fileContents = helpers.getFile(file)
-
             id = newItem.get('id', '')
 
-            if id and f',{id},' in fileContents:
+            if self.getOutputFile(file).contains(id):
                 logging.info(f'Skipping. {id} is already in {helpers.fileNameOnly(file)}.')
                 result = True
                 break
 
         return result
 
+    def getOutputFile(self, fileName, fields=None):
+        # other workers may share the same files
+        with self.lock:
+            if not fileName in self.outputFiles:
+                shardBy = self.options.get('splitOutputBy', '')
+
+                if shardBy or self.options.get('maximumRowsPerFile', 0) > 0:
+                    manifest = self.getManifest(os.path.dirname(fileName))
+                    self.outputFiles[fileName] = ShardedOutputFile(fileName, manifest, shardBy, self.options.get('maximumRowsPerFile', 0))
+                else:
+                    self.outputFiles[fileName] = OutputFile(fileName)
+
+            outputFile = self.outputFiles[fileName]
+
+        # for the header
+        if fields:
+            outputFile.fields = fields
+
+        return outputFile
+
+    def getManifest(self, directory):
+        if not directory in self.manifests:
+            self.manifests[directory] = Manifest(os.path.join(directory, 'manifest.json'))
+
+        return self.manifests[directory]
+
+    def close(self):
+        self.pipeline.close()
+
+        if self.executor:
+            self.executor.shutdown()
+
+        self.executor = None
+
+        for objects in self.allThreadObjects:
+            objects['googleMaps'].close()
+
+        self.allThreadObjects = []
+
+        for outputFile in self.outputFiles.values():
+            outputFile.close()
+
     def isDone(self, inputRow):
         result = False
 
@@ -466,13 +679,15 @@ class InformationFinder:
         keyword = inputRow.get('keyword', '')
         maximumNewResults = inputRow.get('maximumNewResults', self.options['maximumNewResults'])
 
-        datePart = ''
+        where = 'keyword = ? and maximumNewResults = ?'
+        parameters = [keyword, int(maximumNewResults)]
 
         if self.options['hoursBetweenRuns'] > 0:
-            minimumDate = helpers.getDateStringSecondsAgo(self.options['hoursBetweenRuns'] * 60 * 60, True)
-            datePart = f" and gmDate >= '{minimumDate}'"
+            minimumTimestamp = helpers.getTimestampSecondsAgo(self.options['hoursBetweenRuns'] * 60 * 60)
+            where += ' and gmTimestamp >= ?'
+            parameters.append(minimumTimestamp)
 
-        row = self.database.getFirst('history', '*', f"keyword = '{keyword}' and maximumNewResults = {maximumNewResults}{datePart}", '', '')
+        row = self.database.getFirst('history', '*', where, parameters)
 
         if row:
             logging.info(f'Skipping {keyword}. Already done within the last {self.options["hoursBetweenRuns"]} hours.')
@@ -480,15 +695,16 @@ class InformationFinder:
 
         return result
     
-    def markDone(self, inputRow, newItems):
-        if not newItems:
+    def markDone(self, inputRow, resultsFound):
+        if not resultsFound:
             return
 
         history = {
             'keyword': inputRow.get('keyword', ''),
-            'resultsFound': len(newItems),
+            'resultsFound': resultsFound,
             'maximumNewResults': self.options['maximumNewResults'],
-            'gmDate': str(datetime.datetime.utcnow())
+            'gmDate': str(datetime.datetime.utcnow()),
+            'gmTimestamp': helpers.getTimestampSecondsAgo()
         }
 
         self.database.insert('history', history)
@@ -535,32 +751,56 @@ class InformationFinder:
 
         return s
 
-    def removeOldEntries(self):
-        maximumDaysToKeepItems = self.options['maximumDaysToKeepItems']
-
-        minimumDate = helpers.getDateStringSecondsAgo(maximumDaysToKeepItems * 24 * 60 * 60, True)
-        
-        logging.debug(f'Deleting entries older than {maximumDaysToKeepItems} days')
-        self.database.execute(f"delete from history where gmDate < '{minimumDate}'")
-
-    def __init__(self, options, database):
+    # shared is another InformationFinder. workers in the same process use the same output files, id's and caches.
+    def __init__(self, options, database, shared=None):
         self.options = options
         self.database = database
-        self.credentials = {}
-        
-        helpers.setOptions('user-data/credentials/credentials.ini', self.credentials, '')
+        self.threadObjects = threading.local()
+        self.allThreadObjects = []
+        self.executor = None
 
-        googleMapsApi = helpers.getNested(self.credentials, ['google maps', 'apiKey'])
+        # created here so it's only created once. kept for the whole run so the threads' objects are reused.
+        if self.options.get('companyThreads', 1) > 1:
+            self.executor = ThreadPoolExecutor(max_workers=self.options['companyThreads'])
 
-        if not googleMapsApi:
-            url =  helpers.getFile('program/resources/resource2')
-            externalApi = Api('')
-            self.credentials['google maps']['apiKey'] = externalApi.getPlain(url)
-
-        self.api = Api('')
-        self.linkedIn = LinkedIn(self.options, False, self.database)
-        self.googleMaps = GoogleMaps(self.options, self.credentials, self.database)
-        self.domainFinder = DomainFinder(self.options)
         self.avoidSocialMediaUrls = ['facebook.com/sharer.php']
+        self.inputFile = ''
+
+        if shared:
+            self.credentials = shared.credentials
+            self.knownIds = shared.knownIds
+            self.lock = shared.lock
+            self.companiesInProgress = shared.companiesInProgress
+            self.proxies = shared.proxies
+            self.companyCache = shared.companyCache
+            self.outputFiles = shared.outputFiles
+            self.manifests = shared.manifests
+        else:
+            self.credentials = {}
+
+            helpers.setOptions('user-data/credentials/credentials.ini', self.credentials, '')
+
+            googleMapsApi = helpers.getNested(self.credentials, ['google maps', 'apiKey'])
+
+            if not googleMapsApi:
+                url =  helpers.getFile('program/resources/resource2')
+                externalApi = Api('')
+                self.credentials['google maps']['apiKey'] = externalApi.getPlain(url)
+
+            self.knownIds = KnownIds(self.database)
+            self.lock = threading.Lock()
+            self.companiesInProgress = set()
+            self.proxies = None
+            self.companyCache = CompanyCache(self.options, self.database)
+            self.outputFiles = {}
+            self.manifests = {}
+
+            hostScheduler.setRateLimits(self.options.get('rateLimits', ''))
+
+        self.linkedIn = LinkedIn(self.options, False, self.database, self.knownIds)
+        self.pipeline = Pipeline(self.options.get('pipelineQueueSize', 10))
+
+        hostScheduler.maximumConcurrentRequests = self.options.get('maximumRequestsPerHost', 2)
 
-        self.removeOldEntries()
+        # creates the objects for the main thread
+        self.getThreadObjects()
@@ -0,0 +1,58 @@
+import logging
+import threading
+
+# id's already in the result table, kept in memory so duplicate checks don't need a query
+class KnownIds:
+    def contains(self, site, id):
+        return id in self.ids.get(site, ())
+
+    def add(self, site, id):
+        if not id:
+            return
+
+        # several worker threads add id's at once
+        with self.lock:
+            if not site in self.ids:
+                self.ids[site] = set()
+
+            self.ids[site].add(id)
+
+    # returns the subset of id's that are already in the database
+    def existing(self, site, ids):
+        result = set()
+
+        unknownIds = []
+
+        for id in ids:
+            if self.contains(site, id):
+                result.add(id)
+            elif id:
+                unknownIds.append(id)
+
+        if not unknownIds:
+            return result
+
+        # other processes might have added some since this one started
+        for id in self.database.existing(site, unknownIds):
+            self.add(site, id)
+            result.add(id)
+
+        return result
+
+    def load(self):
+        self.ids = {}
+
+        count = 0
+
+        for site, id in self.database.iterate('result', 'site, id', None, asTuples=True):
+            self.add(site, id)
+            count += 1
+
+        logging.debug(f'Loaded {count} known id\'s from the database')
+
+    def __init__(self, database):
+        self.database = database
+        self.ids = {}
+        self.lock = threading.Lock()
+
+        self.load()
@@ -0,0 +1,307 @@
+import os
+import csv
+import json
+import time
+import datetime
+import atexit
+import logging
+import threading
+
+from . import helpers
+
+# a csv output file that stays open for the whole run. keeps the id's in the file in memory so checking for duplicates doesn't mean reading the whole file.
+class OutputFile:
+    def write(self, values, id=''):
+        with self.lock:
+            self.open()
+
+            self.writer.writerow(values)
+            self.rowsSinceFlush += 1
+            self.rows += 1
+
+            self.addId(id)
+
+            if self.rowsSinceFlush >= self.flushEvery or time.time() - self.lastFlush >= self.secondsBetweenFlushes:
+                self.flush()
+            else:
+                # otherwise rows written before a slow keyword could wait for a long time
+                self.startFlushThread()
+
+    def startFlushThread(self):
+        if self.flushThread:
+            return
+
+        self.flushThread = threading.Thread(target=self.flushPeriodically, daemon=True)
+        self.flushThread.start()
+
+    # flushes rows that have waited too long even when nothing else is written
+    def flushPeriodically(self):
+        while not self.stopFlushing.wait(self.secondsBetweenFlushes / 4):
+            with self.lock:
+                if self.rowsSinceFlush and time.time() - self.lastFlush >= self.secondsBetweenFlushes:
+                    self.flush()
+
+    def open(self):
+        if self.file:
+            return
+
+        # need the existing id's before anything new is written
+        self.loadIds()
+
+        helpers.makeDirectory(os.path.dirname(self.fileName))
+
+        needsHeader = not os.path.exists(self.fileName) or os.path.getsize(self.fileName) == 0
+
+        # the buffer gets written when flush() is called or it fills up
+        self.file = open(self.fileName, 'a', newline='\n', encoding='utf-8', buffering=self.bufferSize)
+        self.writer = csv.writer(self.file, delimiter=',')
+
+        if needsHeader and self.fields:
+            self.file.write(','.join(self.fields) + '\n')
+
+    def flush(self):
+        if not self.file:
+            return
+
+        self.file.flush()
+
+        self.rowsSinceFlush = 0
+        self.lastFlush = time.time()
+
+    def close(self):
+        # outside the lock because the flush thread needs it to finish
+        self.stopFlushing.set()
+
+        if self.flushThread:
+            self.flushThread.join()
+
+        with self.lock:
+            self.flushThread = None
+            self.stopFlushing = threading.Event()
+
+            if not self.file:
+                return
+
+            self.flush()
+            self.file.close()
+
+            self.file = None
+            self.writer = None
+
+    def contains(self, id):
+        if not id:
+            return False
+
+        with self.lock:
+            self.loadIds()
+
+            return id in self.ids
+
+    def addId(self, id):
+        if not id:
+            return
+
+        with self.lock:
+            self.loadIds()
+
+            self.ids.add(id)
+
+    def loadIds(self):
+        if self.ids is not None:
+            return
+
+        self.ids = set()
+        self.rows = 0
+
+        if not os.path.exists(self.fileName):
+            return
+
+        with open(self.fileName, encoding='utf-8', errors='replace', newline='') as file:
+            reader = csv.reader(file)
+
+            header = next(reader, [])
+
+            if not 'id' in header:
+                logging.debug(f'No id column in {self.fileName}')
+                return
+
+            index = header.index('id')
+
+            for row in reader:
+                self.rows += 1
+
+                if len(row) > index and row[index]:
+                    self.ids.add(row[index])
+
+        logging.debug(f'Found {len(self.ids)} id\'s in {self.fileName}')
+
+    def __init__(self, fileName, fields=None):
+        self.fileName = fileName
+        self.fields = fields
+        # loaded the first time it's needed
+        self.ids = None
+        self.file = None
+        self.writer = None
+        self.lock = threading.RLock()
+        self.bufferSize = 64 * 1024
+        self.flushEvery = 100
+        self.secondsBetweenFlushes = 5
+        self.rowsSinceFlush = 0
+        self.lastFlush = time.time()
+        self.rows = 0
+        self.flushThread = None
+        self.stopFlushing = threading.Event()
+
+        atexit.register(self.close)
+
+# lists the files each output file is split into
+class Manifest:
+    def getFiles(self, baseName):
+        return self.files.get(baseName, [])
+
+    def add(self, baseName, fileName):
+        with self.lock:
+            if not baseName in self.files:
+                self.files[baseName] = []
+
+            if fileName in self.files[baseName]:
+                return
+
+            self.files[baseName].append(fileName)
+
+            helpers.makeDirectory(os.path.dirname(self.fileName))
+            helpers.toFile(json.dumps(self.files, indent=4), self.fileName)
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.lock = threading.Lock()
+        self.files = {}
+
+        if os.path.exists(self.fileName):
+            self.files = helpers.getJsonFile(self.fileName)
+
+# splits an output file by input file, by day or by number of rows. checks for duplicates across all the parts.
+class ShardedOutputFile:
+    # the input file is passed in because several workers can write to the same file at once
+    def write(self, values, id='', inputFile=''):
+        with self.lock:
+            self.getCurrentFile(inputFile).write(values, id)
+
+            self.addId(id)
+
+    def getCurrentFile(self, inputFile):
+        key = ''
+
+        if self.shardBy == 'input':
+            key = helpers.lettersAndNumbersOnly(helpers.fileNameOnly(inputFile, False))
+        elif self.shardBy == 'day':
+            key = datetime.datetime.utcnow().strftime('%Y-%m-%d')
+
+        if key != self.currentKey:
+            self.currentKey = key
+            self.currentIndex = self.getLastIndex(key)
+
+        outputFile = self.getFile(self.getShardName(key, self.currentIndex))
+
+        # start a new file when this one is full
+        if self.maximumRowsPerFile > 0:
+            outputFile.loadIds()
+
+            while outputFile.rows >= self.maximumRowsPerFile:
+                self.currentIndex += 1
+                outputFile = self.getFile(self.getShardName(key, self.currentIndex))
+                outputFile.loadIds()
+
+        return outputFile
+
+    def getLastIndex(self, key):
+        result = 1
+
+        prefix = self.getShardPrefix(key)
+
+        for fileName in self.manifest.getFiles(self.baseName):
+            if not fileName.startswith(prefix):
+                continue
+
+            index = helpers.findBetween(fileName[len(prefix):], '', '.')
+
+            if index.isdigit() and int(index) > result:
+                result = int(index)
+
+        return result
+
+    def getShardPrefix(self, key):
+        result = helpers.fileNameOnly(self.baseName, False) + '-'
+
+        if key:
+            result += f'{key}-'
+
+        return result
+
+    def getShardName(self, key, index):
+        return f'{self.getShardPrefix(key)}{index}.csv'
+
+    def getFile(self, shardName):
+        if not shardName in self.files:
+            self.files[shardName] = OutputFile(os.path.join(self.directory, shardName), self.fields)
+
+            self.manifest.add(self.baseName, shardName)
+
+        outputFile = self.files[shardName]
+        outputFile.fields = self.fields
+
+        return outputFile
+
+    def contains(self, id):
+        if not id:
+            return False
+
+        with self.lock:
+            self.loadIds()
+
+            return id in self.ids
+
+    def addId(self, id):
+        if not id:
+            return
+
+        with self.lock:
+            self.loadIds()
+
+            self.ids.add(id)
+
+    # the id's from all the parts
+    def loadIds(self):
+        if self.ids is not None:
+            return
+
+        self.ids = set()
+
+        # output.csv or companies.csv from before the output was split. only read, never written to.
+        unsplitFile = OutputFile(os.path.join(self.directory, self.baseName), self.fields)
+        unsplitFile.loadIds()
+
+        self.ids.update(unsplitFile.ids)
+
+        for fileName in self.manifest.getFiles(self.baseName):
+            outputFile = self.getFile(fileName)
+            outputFile.loadIds()
+
+            self.ids.update(outputFile.ids)
+
+    def close(self):
+        for outputFile in self.files.values():
+            outputFile.close()
+
+    def __init__(self, fileName, manifest, shardBy, maximumRowsPerFile, fields=None):
+        self.directory = os.path.dirname(fileName)
+        self.baseName = helpers.fileNameOnly(fileName)
+        self.manifest = manifest
+        self.shardBy = shardBy
+        self.maximumRowsPerFile = maximumRowsPerFile
+        self.fields = fields
+        self.files = {}
+        self.ids = None
+        self.currentKey = None
+        self.currentIndex = 1
+        self.lock = threading.RLock()
@@ -0,0 +1,103 @@
+import queue
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+# runs each stage in its own thread with a bounded queue between stages. memory depends on the queue size, not on the number of items.
+# a stage is a function that takes an iterable of items and returns an iterable of items.
+class Pipeline:
+    def run(self, source, stages):
+        self.stopEvent = threading.Event()
+        self.closed = set()
+        self.error = None
+        self.queues = [queue.Queue(self.queueSize) for i in range(0, len(stages) + 1)]
+
+        # the threads are kept between runs, so the objects each thread keeps are reused
+        if not self.executor or self.threads < len(stages) + 1:
+            if self.executor:
+                self.executor.shutdown()
+
+            self.threads = len(stages) + 1
+            self.executor = ThreadPoolExecutor(max_workers=self.threads)
+
+        futures = [self.executor.submit(self.runStage, source, None, 0)]
+
+        for i, stage in enumerate(stages):
+            items = stage(self.iterateQueue(i))
+
+            futures.append(self.executor.submit(self.runStage, items, i, i + 1))
+
+        try:
+            # the last stage is read by the calling thread
+            yield from self.iterateQueue(len(stages))
+        finally:
+            # in case the caller stopped early
+            self.stopEvent.set()
+
+            for future in futures:
+                future.result()
+
+        if self.error:
+            raise self.error
+
+    def runStage(self, items, inputIndex, outputIndex):
+        try:
+            for item in items:
+                if not self.put(outputIndex, item):
+                    break
+        except Exception as e:
+            # the caller gets the error. the other stages stop so the results aren't treated as complete.
+            with self.lock:
+                if not self.error:
+                    self.error = e
+
+            self.stopEvent.set()
+        finally:
+            # lets the stages before this one stop too
+            if inputIndex is not None:
+                self.closed.add(inputIndex)
+
+            if hasattr(items, 'close'):
+                items.close()
+
+            self.put(outputIndex, self.end)
+
+    def put(self, index, item):
+        while not self.stopEvent.is_set() and not index in self.closed:
+            try:
+                self.queues[index].put(item, timeout=self.secondsToWait)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    def iterateQueue(self, index):
+        while not self.stopEvent.is_set():
+            try:
+                item = self.queues[index].get(timeout=self.secondsToWait)
+            except queue.Empty:
+                continue
+
+            if item is self.end:
+                break
+
+            yield item
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown()
+
+        self.executor = None
+
+    def __init__(self, queueSize=10):
+        self.queueSize = queueSize
+        self.secondsToWait = 0.1
+        self.end = object()
+        self.stopEvent = threading.Event()
+        self.closed = set()
+        self.error = None
+        self.lock = threading.Lock()
+        self.queues = []
+        self.executor = None
+        self.threads = 0
@@ -0,0 +1,115 @@
+import logging
+import time
+
+from . import helpers
+
+from .helpers import get
+
+# removes old entries and compacts the database. runs between keywords instead of at startup.
+class Retention:
+    def runIfDue(self):
+        lastRun = self.getLastRun()
+
+        if lastRun and lastRun > helpers.getTimestampSecondsAgo(self.options['hoursBetweenMaintenance'] * 60 * 60):
+            return
+
+        # maintenance failing shouldn't stop the search. it's tried again next time.
+        try:
+            self.run()
+        except Exception as e:
+            self.database.handleException(e)
+
+    def run(self):
+        maximumDaysToKeepItems = self.options['maximumDaysToKeepItems']
+
+        logging.info(f'Deleting entries older than {maximumDaysToKeepItems} days')
+
+        minimumTimestamp = helpers.getTimestampSecondsAgo(maximumDaysToKeepItems * 24 * 60 * 60)
+
+        for table in ['history', 'result']:
+            deleted = self.deleteInBatches(table, minimumTimestamp)
+
+            logging.info(f'Deleted {deleted} old entries from {table}')
+
+        # searches that were interrupted and never continued
+        minimumTimestamp = helpers.getTimestampSecondsAgo(self.options.get('hoursToKeepCheckpoints', 24) * 60 * 60)
+
+        deleted = self.deleteInBatches('checkpoint', minimumTimestamp)
+
+        logging.info(f'Deleted {deleted} old entries from checkpoint')
+
+        self.compact()
+
+        self.database.insert('setting', {'name': 'lastMaintenance', 'value': str(helpers.getTimestampSecondsAgo())})
+
+    def deleteInBatches(self, table, minimumTimestamp):
+        result = 0
+
+        query = f'delete from {table} where rowid in (select rowid from {table} where gmTimestamp < ? limit ?)'
+
+        if self.database.type == 'mysql':
+            query = f'delete from {table} where gmTimestamp < ? limit ?'
+
+        while True:
+            # small transactions so other processes only wait briefly for the lock
+            with self.database.transaction():
+                self.database.execute(query, (minimumTimestamp, self.batchSize))
+                deleted = self.database.cursor.rowcount
+
+            result += max(deleted, 0)
+
+            if deleted < self.batchSize:
+                break
+
+            # give other writers a chance
+            time.sleep(self.secondsBetweenBatches)
+
+        return result
+
+    def compact(self):
+        if self.database.type == 'mysql':
+            self.database.execute('analyze table result, history')
+            return
+
+        # incremental vacuum only works after the database is converted once with compact.py
+        if self.usesIncrementalVacuum():
+            logging.debug(f'Freeing up to {self.pagesToVacuum} unused pages')
+
+            self.database.commit()
+
+            # with execute() sqlite3 only runs the first step, which frees one page. executescript doesn't retry, so a lock just skips it this time.
+            try:
+                self.database.connection.executescript(f'pragma incremental_vacuum({int(self.pagesToVacuum)});')
+            except Exception as e:
+                self.database.handleException(e)
+
+        # updates statistics the query planner uses, but only where it's needed
+        self.database.execute('pragma optimize')
+
+    # a full vacuum rewrites the whole file under an exclusive lock and needs up to twice the disk space. so it only runs from compact.py.
+    def convertToIncrementalVacuum(self):
+        if self.database.type != 'sqlite' or self.usesIncrementalVacuum():
+            return
+
+        logging.info('Converting the database to incremental vacuum. This only happens once and can take a while for a large database.')
+
+        self.database.commit()
+        self.database.execute('pragma auto_vacuum = incremental')
+        self.database.execute('vacuum')
+
+    def usesIncrementalVacuum(self):
+        row = self.database.getFirst('pragma_auto_vacuum', 'auto_vacuum', None)
+
+        return get(row, 'auto_vacuum') == 2
+
+    def getLastRun(self):
+        row = self.database.getFirst('setting', 'value', 'name = ?', ('lastMaintenance',))
+
+        return int(get(row, 'value') or 0)
+
+    def __init__(self, options, database):
+        self.options = options
+        self.database = database
+        self.batchSize = 1000
+        self.secondsBetweenBatches = 0.05
+        self.pagesToVacuum = 5000
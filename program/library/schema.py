@@ -0,0 +1,67 @@
+# each function upgrades the database by one version. only add new ones to the end.
+
+def createTables(database):
+    jsonType = 'text'
+
+    # compressed json is binary
+    if database.type == 'mysql':
+        jsonType = database.binaryType
+
+    database.execute(f'create table if not exists result ( site {database.stringKeyType}, keyword text, id {database.stringKeyType}, name text, gmDate text, json {jsonType}, primary key(site, id) )')
+    database.execute(f'create table if not exists history ( id {database.autoIncrementKeyType}, keyword text, resultsFound integer, maximumNewResults integer, gmDate text )')
+
+
+def addTimestamps(database):
+    # seconds since 1970 in gmt. sorts and compares as a number instead of as text.
+    for table in ['result', 'history']:
+        if not database.columnExists(table, 'gmTimestamp'):
+            database.execute(f'alter table {table} add column gmTimestamp integer')
+
+        if database.type == 'sqlite':
+            database.execute(f"update {table} set gmTimestamp = cast(strftime('%s', substr(gmDate, 1, 19)) as integer) where gmTimestamp is null and gmDate is not null")
+        elif database.type == 'mysql':
+            database.execute(f'update {table} set gmTimestamp = unix_timestamp(substr(gmDate, 1, 19)) where gmTimestamp is null and gmDate is not null')
+
+
+def addIndexes(database):
+    if database.type == 'sqlite':
+        # for InformationFinder.isDone
+        database.execute('create index if not exists historyKeyword on history (keyword, maximumNewResults, gmTimestamp)')
+        # for removing old entries
+        database.execute('create index if not exists resultTimestamp on result (gmTimestamp)')
+        database.execute('analyze')
+    elif database.type == 'mysql':
+        # text columns need a prefix length
+        database.execute('create index historyKeyword on history (keyword(100), maximumNewResults, gmTimestamp)')
+        database.execute('create index resultTimestamp on result (gmTimestamp)')
+        database.execute('analyze table result, history')
+
+
+# for values that need to be remembered between runs
+def createSettings(database):
+    database.execute(f'create table if not exists setting ( name {database.stringKeyType} primary key, value text )')
+
+
+# enriched company information, reused for every profile that lists the company
+def createCompanyTable(database):
+    jsonType = 'text'
+
+    if database.type == 'mysql':
+        jsonType = database.binaryType
+
+    database.execute(f'create table if not exists company ( id {database.stringKeyType} primary key, name text, gmTimestamp integer, json {jsonType} )')
+
+
+# how far each keyword's search got, so an interrupted search can continue. deleted when the keyword is done.
+def createCheckpointTable(database):
+    database.execute(f'create table if not exists checkpoint ( keyword {database.stringKeyType}, searchType {database.stringKeyType}, start integer, searchResultIndex integer, searchResults text, enriched text, gmTimestamp integer, primary key(keyword, searchType) )')
+
+
+migrations = [
+    createTables,
+    addTimestamps,
+    addIndexes,
+    createSettings,
+    createCompanyTable,
+    createCheckpointTable
+]
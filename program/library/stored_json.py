@@ -0,0 +1,44 @@
+import json
+import zlib
+
+# compressed values start with this. anything else is plain json, like the rows written before compression existed.
+compressedPrefix = b'zlib:'
+
+def encode(item, compress=True):
+    result = json.dumps(item)
+
+    if compress:
+        result = compressedPrefix + zlib.compress(result.encode('utf-8'))
+
+    return result
+
+
+def decode(value):
+    if not value:
+        return {}
+
+    if isinstance(value, (memoryview, bytearray)):
+        value = bytes(value)
+
+    if isinstance(value, bytes):
+        if value.startswith(compressedPrefix):
+            value = zlib.decompress(value[len(compressedPrefix):])
+
+        value = value.decode('utf-8')
+
+    return json.loads(value)
+
+
+# only decodes when the value is actually needed
+class StoredJson:
+    def get(self):
+        if not self.decoded:
+            self.value = decode(self.raw)
+            self.decoded = True
+
+        return self.value
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.value = None
+        self.decoded = False
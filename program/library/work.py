@@ -7,6 +7,26 @@ from . import helpers
 
 from ..library.helpers import get
 from ..library.api import Api
+from ..library.host_scheduler import hostScheduler
+from ..library.known_ids import KnownIds
+
+def getPositionsAsString(item):
+    values = []
+
+    for position in get(item, 'positions'):
+        title = get(position, 'title')
+        company = get(position, 'company')
+        startYear = get(position, 'startYear')
+        endYear = get(position, 'endYear')
+
+        if not endYear:
+            endYear = 'present'
+
+        s = f'{title} at {company} ({startYear} to {endYear})'
+
+        values.append(s)
+
+    return '; '.join(values)
 
 class SalesQl:
     def search(self, item):
@@ -33,10 +53,8 @@ class SalesQl:
                 if url.startswith('/contacts/'):
                     self.api.setHeadersFromHarFile('credentials/mlhacebjlefifkldmkbilohcaiednbik.har', 'api.salesql.com/')
 
+                    # api.salesql.com has a rate limit in hostScheduler
                     j = self.api.get(url)
-
-                    if not '--debug' in sys.argv:
-                        time.sleep(1)
                 elif url.startswith('/extension/'):
                     j = self.waitForContactInformation(url, item, searchTerm)            
             
@@ -48,7 +66,9 @@ class SalesQl:
                 break
 
             logging.info(f'No contact info yet. Waiting: {i + 1} of {maximumTries}.')
-            helpers.wait(5)
+
+            if not helpers.wait(5):
+                break
 
         result = self.parseResult(searchTerm, j)
         
@@ -72,9 +92,6 @@ class SalesQl:
 
         result = self.api.post(url, body)
 
-        if not '--debug' in sys.argv:
-            time.sleep(1)
-
         return result
 
     def parseResult(self, searchTerm, j):
@@ -188,26 +205,31 @@ class LinkedIn:
         return results
 
     def addDetails(self, searchItem, list):
-        newResults = []
+        return [newItem for newItem in self.iterateDetails(searchItem, list)]
+
+    # yields each result as soon as its details are found
+    # resultsFound is how many results a previous run already wrote for this keyword
+    def iterateDetails(self, searchItem, items, resultsFound=0):
+        maximum = searchItem.get('maximumNewResults', self.options['maximumNewResults'])
+        maximum = int(maximum)
 
-        for listItem in list:
+        if resultsFound >= maximum:
+            return
+
+        for listItem in items:
             if get(searchItem, 'search type') == 'companies':
                 details = self.getCompanyInformation(None, listItem.get('urn', ''), listItem.get('url', ''))
             else:
                 details = self.getProfileInformation(listItem.get('url', ''))
 
             if details:
-                newResults.append(details[0])
-
-            maximum = searchItem.get('maximumNewResults', self.options['maximumNewResults'])
-            maximum = int(maximum)
+                resultsFound += 1
+                yield details[0]
 
-            if len(newResults) >= maximum:
-                logging.info(f'Stopping for this keyword. Got {len(newResults)} results.')
+            if resultsFound >= maximum:
+                logging.info(f'Stopping for this keyword. Got {resultsFound} results.')
                 break
 
-        return newResults
-
     def getProfileInformation(self, keyword):
         results = []
 
@@ -423,22 +445,7 @@ class LinkedIn:
         return company
 
     def getPositionsAsString(self, item):
-        values = []
-
-        for position in get(item, 'positions'):
-            title = get(position, 'title')
-            company = get(position, 'company')
-            startYear = get(position, 'startYear')
-            endYear = get(position, 'endYear')
-
-            if not endYear:
-                endYear = 'present'
-
-            s = f'{title} at {company} ({startYear} to {endYear})'
-
-            values.append(s)
-
-        return '; '.join(values)
+        return getPositionsAsString(item)
 
     def addIfNotExists(self, list, newItem, key):
         if not newItem:
@@ -471,7 +478,10 @@ class LinkedIn:
         return result
 
     def addContactInformation(self, searchItem, results):
-        newResults = []
+        return [newItem for newItem in self.iterateContactInformation(searchItem, results)]
+
+    def iterateContactInformation(self, searchItem, results):
+        resultsFound = 0
 
         keyword = get(searchItem, 'keyword')
 
@@ -499,22 +509,24 @@ class LinkedIn:
                 if not newItem.get(key, ''):
                     newItem[key] = salesQlResult[key]
 
-            newResults.append(newItem)
+            resultsFound += 1
 
-            logging.info(f'Site: linkedin.com. Keyword: {keyword}. Results: {len(newResults)}. Name: {self.getName(newItem)}. Email: {email}. Phone: {phone}.')
+            logging.info(f'Site: linkedin.com. Keyword: {keyword}. Results: {resultsFound}. Name: {self.getName(newItem)}. Email: {email}. Phone: {phone}.')
+
+            yield newItem
             
             maximum = searchItem.get('maximumNewResults', self.options['maximumNewResults'])
             maximum = int(maximum)
 
-            if len(newResults) >= maximum:
-                logging.info(f'Stopping for this keyword. Got {len(newResults)} results.')
+            if resultsFound >= maximum:
+                logging.info(f'Stopping for this keyword. Got {resultsFound} results.')
                 break
 
-        return newResults
-
     def getSearchResults(self, searchItem):
-        results = []
+        return [newItem for newItem in self.iterateSearchResults(searchItem)]
 
+    # yields the new search hits a page at a time, so the next stage can start before the search is finished
+    def iterateSearchResults(self, searchItem, checkpoint=None):
         import urllib.parse
         query = searchItem.get('keyword', '')
         query = urllib.parse.quote(query)
@@ -524,7 +536,14 @@ class LinkedIn:
 
         onSearchResultIndex = 0
 
-        for i in range(0, 100):
+        # continue where an interrupted run stopped
+        if checkpoint:
+            start = checkpoint.start
+            onSearchResultIndex = checkpoint.searchResultIndex
+
+            yield from self.getNotInDatabase(checkpoint.searchResults)
+
+        for i in range(start // count, 100):
             logging.info(f'Getting page {i + 1} of LinkedIn search results')
 
             anyResultsForThisPage = False
@@ -534,15 +553,24 @@ class LinkedIn:
             if get(searchItem, 'search type') == 'companies':
                 url = f'/voyager/api/search/blended?count=10&filters=List(resultType-%3ECOMPANIES)&keywords={query}&origin=GLOBAL_SEARCH_HEADER&q=all&queryContext=List(spellCorrectionEnabled-%3Etrue)&start={start}'
             
+            # instead of sleeping after each page. the gap is the same but other threads can use the time.
+            if not hostScheduler.acquire('linkedInSearchPage'):
+                logging.info('Stopping search')
+                return
+
             j = self.api.get(url)
             
             elements = helpers.getNested(j, ['data', 'elements'])
 
+            # checked against the database all at once at the end of the page
+            pageResults = []
+
             # find the right types of elements
             for element in elements:
                 if self.hitPaywall(element):
                     logging.info(f'Found {onSearchResultIndex} search results')
-                    return results
+                    yield from self.getNotInDatabase(pageResults)
+                    return
 
                 if element.get('type', '') != 'SEARCH_HITS':
                     continue
@@ -555,7 +583,8 @@ class LinkedIn:
 
                     if onSearchResultIndex >= maximum:
                         logging.info(f'Reached search result limit: {onSearchResultIndex}')
-                        return results
+                        yield from self.getNotInDatabase(pageResults)
+                        return
                     
                     onSearchResultIndex += 1
 
@@ -596,29 +625,20 @@ class LinkedIn:
                         logging.debug('Skipping. Id is UNKNOWN.')
                         continue
 
-                    if self.inDatabase(newItem.get('id', '')):
-                        continue
+                    pageResults.append(newItem)
 
-                    results.append(newItem)
+            start += count
+
+            if checkpoint:
+                checkpoint.addPage(start, onSearchResultIndex, pageResults)
+
+            yield from self.getNotInDatabase(pageResults)
 
             logging.info(f'Found {onSearchResultIndex} search results so far')
             
             if not anyResultsForThisPage:
                 logging.info('Stopping search. No search results on this page.')
                 break
-            
-            # wait after each page
-            seconds = random.randrange(5, 10)
-
-            if '--debug' in sys.argv:
-                seconds = 1
-
-            logging.info(f'Waiting {seconds} seconds')
-            time.sleep(seconds)
-
-            start += count
-
-        return results
 
     def getCompanyUrl(self, companyUrn, response):
         result = ''
@@ -647,14 +667,32 @@ class LinkedIn:
         return result
 
 
+    def getNotInDatabase(self, items):
+        results = []
+
+        site = helpers.getDomainName(self.url)
+
+        ids = [get(item, 'id') for item in items]
+
+        existingIds = self.knownIds.existing(site, ids)
+
+        for item in items:
+            id = get(item, 'id')
+
+            if id in existingIds:
+                logging.info(f'Skipping. Already have {id} in the database.')
+                continue
+
+            results.append(item)
+
+        return results
+
     def inDatabase(self, id):
         result = False
         
         site = helpers.getDomainName(self.url)
         
-        row = self.database.getFirst('result', 'id', f"site = '{site}' and id = '{id}'", '', '')
-
-        if row:
+        if self.knownIds.contains(site, id):
             logging.info(f'Skipping. Already have {id} in the database.')
             result = True
 
@@ -666,10 +704,14 @@ class LinkedIn:
     def isCompanyUrl(self, item):
         return get(item, 'keyword').startswith('https://www.linkedin.com/company/')
 
-    def __init__(self, options, useSalesql, database):
+    def __init__(self, options, useSalesql, database, knownIds=None):
         self.options = options
         self.useSalesql = useSalesql
         self.database = database        
+        self.knownIds = knownIds
+
+        if not self.knownIds:
+            self.knownIds = KnownIds(self.database)
         
         self.url = 'https://www.linkedin.com'
         self.api = Api(self.url)
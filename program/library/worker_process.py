@@ -0,0 +1,50 @@
+import atexit
+import logging
+import multiprocessing
+
+from . import helpers
+
+from .helpers import get
+from .database import openDatabase
+from .information_finder import InformationFinder
+from .host_scheduler import hostScheduler
+
+# what each worker process keeps between items
+worker = {}
+
+# runs once in each worker process
+def startWorker(options, sharedTimes=None, sharedLock=None):
+    index = helpers.findBetween(multiprocessing.current_process().name, '-', '')
+
+    helpers.setUpLogging('user-data/logs', f'-worker{index}')
+
+    # several processes can't share the csv files. the main process exports them from the database at the end.
+    options = dict(options)
+    options['writeCsvFiles'] = 0
+
+    database = openDatabase(options)
+    database.commitEvery = options['commitEvery']
+    database.millisecondsBetweenCommits = options['millisecondsBetweenCommits']
+
+    worker['database'] = database
+    worker['informationFinder'] = InformationFinder(options, database)
+
+    # the rate limits are for all the workers together, not for each one
+    if sharedTimes is not None:
+        hostScheduler.share(sharedTimes, sharedLock)
+
+    atexit.register(stopWorker)
+
+def stopWorker():
+    if not worker:
+        return
+
+    worker['informationFinder'].close()
+    worker['database'].close()
+
+    worker.clear()
+
+def doItem(inputRow, outputDirectory, inputFile):
+    logging.info(f'Input file: {helpers.fileNameOnly(inputFile)}. Keyword: {get(inputRow, "keyword")}. Search type: {inputRow.get("type", "url")}.')
+
+    worker['informationFinder'].run(inputRow, outputDirectory, inputFile)